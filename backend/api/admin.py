@@ -3,7 +3,8 @@ from django.contrib.auth import get_user_model
 
 from .models import (
     Ingredient, Tag, RecipeIngredient,
-    Recipe, Follow, Favourite, ShoppingCart
+    Recipe, Follow, Favourite, ShoppingCart, ShoppingListItem, UserStats,
+    RecipePopularity, Job
 )
 
 User = get_user_model()
@@ -19,16 +20,24 @@ class UserAdmin(admin.ModelAdmin):
 class RecipeAdmin(admin.ModelAdmin):
     list_display = (
         'id', 'author', 'name', 'image', 'text', 'tags_string',
-        'cooking_time', 'pub_date', 'count_in_favourites'
+        'cooking_time', 'pub_date', 'count_in_favourites',
+        'count_in_carts'
     )
     empty_value_display = '-пусто-'
     list_filter = ('name', 'author', 'tags__slug',)
     search_fields = ('name', 'author__username', 'tags__slug',)
 
     def count_in_favourites(self, obj):
-        return obj.favorited_by.all().count()
+        return obj.favorites_count
 
     count_in_favourites.short_description = 'times added to favourites'
+    count_in_favourites.admin_order_field = 'favorites_count'
+
+    def count_in_carts(self, obj):
+        return obj.cart_count
+
+    count_in_carts.short_description = 'times added to shopping carts'
+    count_in_carts.admin_order_field = 'cart_count'
 
     def tags_string(self, obj):
         return list(obj.tags.all().values_list('slug', flat=True))
@@ -68,6 +77,32 @@ class FavouritesAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
+class ShoppingListItemAdmin(admin.ModelAdmin):
+    list_display = ('id', 'user', 'ingredient', 'total_amount')
+    empty_value_display = '-пусто-'
+
+
+class UserStatsAdmin(admin.ModelAdmin):
+    list_display = (
+        'user', 'recipes_count', 'followers_count', 'fan_out_on_read'
+    )
+    empty_value_display = '-пусто-'
+    ordering = ('-recipes_count',)
+
+
+class RecipePopularityAdmin(admin.ModelAdmin):
+    list_display = ('recipe', 'score')
+    empty_value_display = '-пусто-'
+    ordering = ('-score',)
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'run_at', 'attempts')
+    list_filter = ('kind', 'status')
+    empty_value_display = '-пусто-'
+    ordering = ('run_at',)
+
+
 admin.site.unregister(User)
 admin.site.register(User, UserAdmin)
 admin.site.register(Recipe, RecipeAdmin)
@@ -77,3 +112,7 @@ admin.site.register(RecipeIngredient, RecipeIngredientAdmin)
 admin.site.register(Follow, FollowAdmin)
 admin.site.register(ShoppingCart, ShoppingCartAdmin)
 admin.site.register(Favourite, FavouritesAdmin)
+admin.site.register(ShoppingListItem, ShoppingListItemAdmin)
+admin.site.register(UserStats, UserStatsAdmin)
+admin.site.register(RecipePopularity, RecipePopularityAdmin)
+admin.site.register(Job, JobAdmin)
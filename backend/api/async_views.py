@@ -0,0 +1,76 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.urls import path
+
+from .views import IngredientsViewSet, RecipesViewSet, TagsViewSet
+
+# Django 3.1 has no async ORM, so the views themselves stay synchronous and
+# run in this pool. The event loop keeps accepting requests while a query is
+# running instead of blocking a whole worker process.
+view_executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_VIEW_THREADS,
+    thread_name_prefix='api-view'
+)
+
+
+def run_in_thread(view):
+    def run(request, *args, **kwargs):
+        # Connections belong to the pool threads, so they are checked and
+        # closed here rather than by the request_finished handler.
+        close_old_connections()
+        try:
+            response = view(request, *args, **kwargs)
+            response.render()
+            return response
+        finally:
+            close_old_connections()
+
+    @wraps(view)
+    async def async_view(request, *args, **kwargs):
+        return await sync_to_async(
+            run,
+            thread_sensitive=False,
+            executor=view_executor
+        )(request, *args, **kwargs)
+
+    return async_view
+
+
+async_urlpatterns = [
+    path(
+        'recipes/',
+        run_in_thread(RecipesViewSet.as_view(
+            {'get': 'list', 'post': 'create'}
+        )),
+        name='recipes-list'
+    ),
+    path(
+        'recipes/<int:id>/',
+        run_in_thread(RecipesViewSet.as_view({
+            'get': 'retrieve',
+            'put': 'update',
+            'patch': 'partial_update',
+            'delete': 'destroy'
+        })),
+        name='recipes-detail'
+    ),
+    path(
+        'tags/',
+        run_in_thread(TagsViewSet.as_view({'get': 'list'})),
+        name='tags-list'
+    ),
+    path(
+        'tags/<int:id>/',
+        run_in_thread(TagsViewSet.as_view({'get': 'retrieve'})),
+        name='tags-detail'
+    ),
+    path(
+        'ingredients/',
+        run_in_thread(IngredientsViewSet.as_view({'get': 'list'})),
+        name='ingredients-list'
+    ),
+]
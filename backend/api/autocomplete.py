@@ -0,0 +1,74 @@
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+from .models import Ingredient
+
+
+class IngredientIndex:
+    def __init__(self):
+        self._entries = None
+        self._built_at = 0
+
+    def invalidate(self):
+        self._entries = None
+
+    def build(self):
+        rows = sorted(
+            (
+                (name.lower(), {
+                    'id': ingredient_id,
+                    'name': name,
+                    'measurement_unit': measurement_unit
+                })
+                for ingredient_id, name, measurement_unit
+                in Ingredient.objects.values_list(
+                    'id', 'name', 'measurement_unit'
+                ).iterator()
+            ),
+            key=lambda row: row[0]
+        )
+        self._entries = (
+            [key for key, item in rows],
+            [item for key, item in rows]
+        )
+        self._built_at = time.monotonic()
+        return self._entries
+
+    def get_entries(self):
+        # The TTL also picks up catalogue changes made by other processes.
+        entries = self._entries
+        if entries is None or time.monotonic() - self._built_at > getattr(
+                settings, 'INGREDIENT_SEARCH_INDEX_TTL', 300
+        ):
+            entries = self.build()
+        return entries
+
+    def search(self, query, limit):
+        keys, items = self.get_entries()
+        query = query.strip().lower()
+
+        result = []
+        start = bisect_left(keys, query)
+        end = start
+        while (
+                end < len(keys)
+                and len(result) < limit
+                and keys[end].startswith(query)
+        ):
+            result.append(items[end])
+            end += 1
+        if not query or len(result) >= limit:
+            return result
+
+        for index, key in enumerate(keys):
+            if start <= index < end or query not in key:
+                continue
+            result.append(items[index])
+            if len(result) >= limit:
+                break
+        return result
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,74 @@
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.db.models import F
+from django.utils.cache import patch_cache_control
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+from .models import ModelVersion
+
+
+def get_initial_version():
+    # Start from a timestamp so a recreated row never brings back an ETag
+    # that was already handed out.
+    return int(time.time() * 1000)
+
+
+def get_model_version(model):
+    label = model._meta.label_lower
+    version = ModelVersion.objects.filter(label=label).values_list(
+        'version',
+        flat=True
+    ).first()
+    if version is None:
+        version = ModelVersion.objects.get_or_create(
+            label=label,
+            defaults={'version': get_initial_version()}
+        )[0].version
+    return version
+
+
+def bump_model_version(model):
+    # Versions live in the database, so a bump from a management command or
+    # another worker is seen by every process, and it is rolled back along
+    # with the transaction that made the change.
+    versions = ModelVersion.objects.filter(label=model._meta.label_lower)
+    if versions.update(version=F('version') + 1):
+        return
+    version, created = ModelVersion.objects.get_or_create(
+        label=model._meta.label_lower,
+        defaults={'version': get_initial_version()}
+    )
+    if not created:
+        versions.update(version=F('version') + 1)
+
+
+def model_version_etag(model):
+    def etag_func(request, *args, **kwargs):
+        return f'{model._meta.model_name}-{get_model_version(model)}'
+    return etag_func
+
+
+def conditional_get(etag_func=None, last_modified_func=None,
+                    cache_control=None):
+    def decorator(method):
+        conditional_method = method_decorator(
+            condition(
+                etag_func=etag_func,
+                last_modified_func=last_modified_func
+            )
+        )(method)
+
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            response = conditional_method(self, request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD'):
+                options = cache_control or settings.API_CACHE_CONTROL
+                if callable(options):
+                    options = options(request)
+                patch_cache_control(response, **options)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,54 @@
+from django.db.models import Count, F
+
+from .models import Follow, Recipe, UserStats
+
+
+def change_recipe_counter(recipe_id, field, delta):
+    Recipe.objects.filter(
+        id=recipe_id,
+        **{f'{field}__gte': -delta}
+    ).update(**{field: F(field) + delta})
+
+
+def get_live_user_counters(user_id):
+    return {
+        'recipes_count': Recipe.objects.filter(author_id=user_id).count(),
+        'followers_count': Follow.objects.filter(author_id=user_id).count()
+    }
+
+
+def change_user_counter(user_id, field, delta):
+    updated = UserStats.objects.filter(
+        user_id=user_id,
+        **{f'{field}__gte': -delta}
+    ).update(**{field: F(field) + delta})
+    if not updated and delta > 0:
+        UserStats.objects.get_or_create(
+            user_id=user_id,
+            defaults=get_live_user_counters(user_id)
+        )
+
+
+def get_live_recipe_counters():
+    return Recipe.objects.annotate(
+        live_favorites_count=Count('favorited_by', distinct=True),
+        live_cart_count=Count('buyer', distinct=True)
+    ).values_list(
+        'id', 'favorites_count', 'cart_count',
+        'live_favorites_count', 'live_cart_count'
+    )
+
+
+def get_live_user_counts():
+    return {
+        'recipes_count': dict(
+            Recipe.objects.values('author').annotate(
+                total=Count('id')
+            ).order_by().values_list('author', 'total')
+        ),
+        'followers_count': dict(
+            Follow.objects.values('author').annotate(
+                total=Count('id')
+            ).order_by().values_list('author', 'total')
+        )
+    }
@@ -0,0 +1,105 @@
+from django.conf import settings
+from django.db.models import Q
+
+from .models import FeedEntry, Follow, Recipe, UserStats
+
+
+def get_fan_out_state(author_id):
+    state = UserStats.objects.filter(user_id=author_id).values_list(
+        'followers_count',
+        'fan_out_on_read'
+    ).first()
+    if state is None:
+        return Follow.objects.filter(author_id=author_id).count(), False
+    return state
+
+
+def fan_out_recipe(recipe):
+    followers_count, fan_out_on_read = get_fan_out_state(recipe.author_id)
+    if fan_out_on_read:
+        return
+    if followers_count >= settings.FEED_FANOUT_MAX_FOLLOWERS:
+        # From now on the author's recipes are merged into feeds on read.
+        UserStats.objects.filter(user_id=recipe.author_id).update(
+            fan_out_on_read=True
+        )
+        return
+    FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(
+                user_id=user_id,
+                author_id=recipe.author_id,
+                recipe=recipe,
+                pub_date=recipe.pub_date
+            )
+            for user_id in Follow.objects.filter(
+                author_id=recipe.author_id
+            ).values_list('user', flat=True).iterator()
+        ],
+        batch_size=1000,
+        ignore_conflicts=True
+    )
+
+
+def update_recipe_entries(recipe):
+    FeedEntry.objects.filter(recipe=recipe).update(pub_date=recipe.pub_date)
+
+
+def add_author_to_feed(user_id, author_id):
+    if get_fan_out_state(author_id)[1]:
+        return
+    recipes = Recipe.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-id'
+    ).values_list('id', 'pub_date')[:settings.FEED_BACKFILL_LIMIT]
+    FeedEntry.objects.bulk_create(
+        [
+            FeedEntry(
+                user_id=user_id,
+                author_id=author_id,
+                recipe_id=recipe_id,
+                pub_date=pub_date
+            )
+            for recipe_id, pub_date in recipes
+        ],
+        ignore_conflicts=True
+    )
+
+
+def remove_author_from_feed(user_id, author_id):
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def get_feed_page(user, position, limit):
+    entries = FeedEntry.objects.filter(user=user)
+    recipes = Recipe.objects.filter(
+        author__following__user=user,
+        author__stats__fan_out_on_read=True
+    )
+    if position is not None:
+        pub_date, recipe_id = position
+        entries = entries.filter(
+            Q(pub_date__lt=pub_date)
+            | Q(pub_date=pub_date, recipe_id__lt=recipe_id)
+        )
+        recipes = recipes.filter(
+            Q(pub_date__lt=pub_date)
+            | Q(pub_date=pub_date, id__lt=recipe_id)
+        )
+
+    rows = dict(
+        (recipe_id, pub_date)
+        for pub_date, recipe_id in entries.order_by(
+            '-pub_date', '-recipe'
+        ).values_list('pub_date', 'recipe')[:limit + 1]
+    )
+    rows.update(
+        (recipe_id, pub_date)
+        for pub_date, recipe_id in recipes.order_by(
+            '-pub_date', '-id'
+        ).values_list('pub_date', 'id')[:limit + 1]
+    )
+    rows = sorted(
+        ((pub_date, recipe_id) for recipe_id, pub_date in rows.items()),
+        reverse=True
+    )
+    return rows[:limit], len(rows) > limit
@@ -1,26 +1,178 @@
+from collections.abc import Mapping
+
 from rest_framework import serializers
-from django.core.files.uploadedfile import SimpleUploadedFile
+from rest_framework.relations import MANY_RELATION_KWARGS, ManyRelatedField
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files.uploadedfile import UploadedFile
 
 import base64
-import uuid
+import binascii
 import tempfile
+import uuid
+
+from PIL import Image
+
+# Multiple of 4 so every chunk is decodable on its own.
+BASE64_CHUNK_SIZE = 64 * 1024
+IMAGE_SIGNATURES = {
+    'png': (b'\x89PNG\r\n\x1a\n',),
+    'jpeg': (b'\xff\xd8\xff',),
+    'gif': (b'GIF87a', b'GIF89a'),
+    'webp': (b'RIFF',),
+}
+
+
+def detect_image_type(header):
+    for image_type, signatures in IMAGE_SIGNATURES.items():
+        if header.startswith(signatures):
+            if image_type == 'webp' and header[8:12] != b'WEBP':
+                continue
+            return image_type
+    return None
 
 
 class CustomImageField(serializers.ImageField):
+    default_error_messages = {
+        'invalid_data_uri': 'Expected a base64 encoded image data URI.',
+        'invalid_base64': 'Image data is not valid base64.',
+        'unsupported_type': 'Unsupported image type.',
+        'too_large': 'Ensure image size is at most {max_size} bytes.',
+    }
+
+    def to_internal_value(self, data):
+        if not isinstance(data, str):
+            self.fail('invalid_data_uri')
+        comma = data.find(',', 0, 100)
+        header = data[:comma]
+        if (
+                comma == -1
+                or not header.startswith('data:image/')
+                or not header.endswith(';base64')
+        ):
+            self.fail('invalid_data_uri')
+
+        # Encoders may wrap the base64 text into lines. The whitespace goes
+        # before chunking, otherwise the chunks lose their alignment.
+        encoded = ''.join(data[comma + 1:].split())
+        max_size = settings.MAX_IMAGE_UPLOAD_SIZE
+        if len(encoded) // 4 * 3 > max_size:
+            self.fail('too_large', max_size=max_size)
+
+        image = tempfile.SpooledTemporaryFile(
+            max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+        )
+        image_type = None
+        size = 0
+        for start in range(0, len(encoded), BASE64_CHUNK_SIZE):
+            try:
+                chunk = base64.b64decode(
+                    encoded[start:start + BASE64_CHUNK_SIZE],
+                    validate=True
+                )
+            except binascii.Error:
+                image.close()
+                self.fail('invalid_base64')
+            if image_type is None:
+                image_type = detect_image_type(chunk[:12])
+                if image_type is None:
+                    image.close()
+                    self.fail('unsupported_type')
+            size += len(chunk)
+            image.write(chunk)
+
+        image.seek(0)
+        try:
+            Image.open(image).verify()
+        except Exception:
+            image.close()
+            self.fail('invalid_image')
+        image.seek(0)
+
+        file = UploadedFile(
+            file=image,
+            name=f'{uuid.uuid4().hex}.{image_type}',
+            content_type=f'image/{image_type}',
+            size=size
+        )
+        return serializers.FileField.to_internal_value(self, file)
+
+
+class BatchedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    # Looks objects up in the result of resolve(), which fetches the ids of
+    # a whole list with one IN query instead of one query per item.
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.resolved = None
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BatchedManyRelatedField(**list_kwargs)
+
+    def to_pk(self, data):
+        if self.pk_field is not None:
+            data = self.pk_field.to_internal_value(data)
+        return self.get_queryset().model._meta.pk.to_python(data)
+
+    def resolve(self, values):
+        pks = set()
+        for value in values:
+            try:
+                pks.add(self.to_pk(value))
+            except (
+                    TypeError,
+                    ValueError,
+                    DjangoValidationError,
+                    serializers.ValidationError
+            ):
+                continue
+        self.resolved = self.get_queryset().in_bulk(pks)
+
+    def to_internal_value(self, data):
+        if self.resolved is None:
+            return super().to_internal_value(data)
+        try:
+            pk = self.to_pk(data)
+        except (TypeError, ValueError, DjangoValidationError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if pk not in self.resolved:
+            self.fail('does_not_exist', pk_value=data)
+        return self.resolved[pk]
+
+
+class BatchedManyRelatedField(ManyRelatedField):
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+
+        self.child_relation.resolve(data)
+        objects = []
+        errors = []
+        for item in data:
+            try:
+                objects.append(self.child_relation.to_internal_value(item))
+            except serializers.ValidationError as error:
+                errors.extend(error.detail)
+        if errors:
+            raise serializers.ValidationError(errors)
+        return objects
+
 
+class BatchedListSerializer(serializers.ListSerializer):
+    # Resolves the batched related fields of every item before the items
+    # are validated one by one, errors are still reported per item.
     def to_internal_value(self, data):
-        data = data.strip('data:image/')
-        index = data.find(';')
-        content_type = data[:index]
-        data = data[index + 8:]
-        image_data = base64.b64decode(data)
-        filename = uuid.uuid4().hex
-        with tempfile.TemporaryFile() as image:
-            image.write(image_data)
-            image.seek(0)
-            file = SimpleUploadedFile(
-                name=f'{filename}.{content_type}',
-                content=image.read(),
-                content_type=f'image/{content_type}'
-            )
-        return super().to_internal_value(file)
+        if isinstance(data, list):
+            for name, field in self.child.fields.items():
+                if isinstance(field, BatchedPrimaryKeyRelatedField):
+                    field.resolve(
+                        item[name] for item in data
+                        if isinstance(item, Mapping) and name in item
+                    )
+        return super().to_internal_value(data)
@@ -1,6 +1,11 @@
 from django_filters import rest_framework as filters
+from django.conf import settings
+from django.db.models import (
+    BooleanField, Case, Exists, OuterRef, Value, When
+)
 
-from .models import Recipe, Ingredient, Tag
+from .models import Favourite, Recipe, Ingredient, ShoppingCart, Tag
+from .search import search_recipes
 
 
 class RecipesFilter(filters.FilterSet):
@@ -15,45 +20,80 @@ class RecipesFilter(filters.FilterSet):
         to_field_name='slug',
         queryset=Tag.objects.all()
     )
+    search = filters.CharFilter(
+        method='filter_search'
+    )
 
     class Meta:
         model = Recipe
-        fields = ['author', 'tags']
+        fields = ['author', 'tags', 'search']
+
+    def filter_search(self, queryset, name, value):
+        return search_recipes(queryset, value)
 
     def filter_is_favorited(self, queryset, name, value):
         if not self.request.user.is_authenticated:
             return queryset
-        ids = list(
-            self.request.user.user_favorites.values_list(
-                'recipe__id',
-                flat=True
-            )
+        return self.filter_exists(
+            queryset,
+            Favourite.objects.filter(
+                user=self.request.user,
+                recipe=OuterRef('pk')
+            ),
+            value
         )
-        if value:
-            return queryset.filter(id__in=ids)
-        else:
-            return queryset.exclude(id__in=ids)
 
     def filter_is_in_shopping_cart(self, queryset, name, value):
         if not self.request.user.is_authenticated:
             return queryset
-        ids = list(
-            self.request.user.shop_list.values_list(
-                'recipe__id',
-                flat=True
-            )
+        return self.filter_exists(
+            queryset,
+            ShoppingCart.objects.filter(
+                user=self.request.user,
+                recipe=OuterRef('pk')
+            ),
+            value
         )
-        if value:
-            return queryset.filter(id__in=ids)
-        else:
-            return queryset.exclude(id__in=ids)
+
+    def filter_exists(self, queryset, related, value):
+        # A correlated subquery answered from the (user, recipe) unique
+        # index, instead of sending every id of the user back to the
+        # database.
+        condition = Exists(related)
+        return queryset.filter(condition if value else ~condition)
 
 
 class IngredientFilter(filters.FilterSet):
     name = filters.CharFilter(
-        lookup_expr='startswith'
+        method='filter_name'
     )
 
     class Meta:
         model = Ingredient
         fields = ['name', ]
+
+    def filter_name(self, queryset, name, value):
+        # Prefix matches are answered from the UPPER(name) pattern index of
+        # migration 0003, a leading wildcard cannot use it. The contains
+        # scan only runs when they do not fill the result.
+        limit = settings.INGREDIENT_SEARCH_LIMIT
+        ids = list(
+            queryset.filter(name__istartswith=value).order_by(
+                'name'
+            ).values_list('id', flat=True)[:limit]
+        )
+        if len(ids) < limit:
+            ids.extend(
+                queryset.filter(name__icontains=value).exclude(
+                    id__in=ids
+                ).order_by('name').values_list('id', flat=True)[
+                    :limit - len(ids)
+                ]
+            )
+        return queryset.filter(id__in=ids).annotate(
+            is_prefix=Case(
+                When(name__istartswith=value, then=Value(True)),
+                default=Value(False),
+                output_field=BooleanField()
+            )
+        ).order_by('-is_prefix', 'name')
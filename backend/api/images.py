@@ -0,0 +1,80 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from sorl.thumbnail import default, delete, get_thumbnail
+
+from .models import Recipe
+from .response_cache import recipe_list_cache
+
+CHUNK_SIZE = 500
+
+
+def get_image_variant(image, variant):
+    options = dict(settings.IMAGE_VARIANTS[variant])
+    geometry = options.pop('geometry')
+    # Variants live in sorl's key value store, so once generated this is a
+    # cache lookup and the source image is not opened again.
+    return get_thumbnail(image, geometry, **options)
+
+
+def generate_image_variants(image):
+    urls = {
+        variant: get_image_variant(image, variant).url
+        for variant in settings.IMAGE_VARIANTS
+    }
+    # Recipes read the stored URLs, so serving them never touches sorl or
+    # the source image.
+    Recipe.objects.filter(image=image).update(image_variants=urls)
+    transaction.on_commit(recipe_list_cache.invalidate)
+
+
+def get_image_variant_urls(recipe, request=None):
+    urls = {}
+    for variant in settings.IMAGE_VARIANTS:
+        # Until the job has generated a variant the original image is served.
+        url = recipe.image_variants.get(variant) or recipe.image.url
+        if request is not None:
+            url = request.build_absolute_uri(url)
+        urls[variant] = url
+    return urls
+
+
+def delete_image(image):
+    # The job may have been queued for a file that a recipe uses again.
+    if Recipe.objects.filter(image=image).exists():
+        return
+    delete(image)
+
+
+def sweep_orphaned_images(now=None):
+    now = now or timezone.now()
+    grace_period = timedelta(seconds=settings.MEDIA_SWEEP_GRACE_PERIOD)
+    directory = Recipe._meta.get_field('image').upload_to
+    if not default_storage.exists(directory):
+        return 0
+    names = [
+        directory + file_name
+        for file_name in default_storage.listdir(directory)[1]
+    ]
+    deleted = 0
+    for start in range(0, len(names), CHUNK_SIZE):
+        chunk = names[start:start + CHUNK_SIZE]
+        used = set(
+            Recipe.objects.filter(image__in=chunk).values_list(
+                'image',
+                flat=True
+            )
+        )
+        for name in chunk:
+            if name in used or (
+                    now - default_storage.get_modified_time(name)
+                    < grace_period
+            ):
+                continue
+            delete(name)
+            deleted += 1
+    default.kvstore.cleanup()
+    return deleted
@@ -0,0 +1,332 @@
+import threading
+import time
+import zlib
+from datetime import timedelta
+from functools import reduce
+from operator import and_
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .caching import bump_model_version, get_model_version
+from .models import IngredientPostings, RecipeIngredient
+
+MATCH_ALL = 'all'
+MATCH_ANY = 'any'
+MATCH_MISSING = 'missing'
+CHUNK_SIZE = 500
+# Rows changed this long before the previous load are read again, so changes
+# of transactions that were still open at that moment are not missed.
+REFRESH_LAG = timedelta(seconds=60)
+
+
+def popcount(bits):
+    if hasattr(bits, 'bit_count'):
+        return bits.bit_count()
+    return bin(bits).count('1')
+
+
+def encode_bitset(bits):
+    return zlib.compress(bits.to_bytes((bits.bit_length() + 7) // 8, 'little'))
+
+
+def decode_bitset(data):
+    if not data:
+        return 0
+    return int.from_bytes(zlib.decompress(bytes(data)), 'little')
+
+
+def bitset_from_ids(ids):
+    ids = list(ids)
+    if not ids:
+        return 0
+    data = bytearray(max(ids) // 8 + 1)
+    for recipe_id in ids:
+        data[recipe_id >> 3] |= 1 << (recipe_id & 7)
+    return int.from_bytes(data, 'little')
+
+
+def add_to_counter(planes, bits):
+    # Counters are bit-sliced: bit N of planes[i] is bit i of the counter of
+    # recipe N, so one big integer operation updates every recipe at once.
+    planes = list(planes)
+    carry = bits
+    for index, plane in enumerate(planes):
+        if not carry:
+            break
+        planes[index], carry = plane ^ carry, plane & carry
+    if carry:
+        planes.append(carry)
+    return planes
+
+
+def subtract_from_counter(planes, bits):
+    planes = list(planes)
+    borrow = bits
+    for index, plane in enumerate(planes):
+        if not borrow:
+            break
+        planes[index], borrow = plane ^ borrow, ~plane & borrow
+    while planes and not planes[-1]:
+        planes.pop()
+    return planes
+
+
+def counter_equals(planes, value):
+    if value <= 0 or value.bit_length() > len(planes):
+        return 0
+    return reduce(and_, (
+        plane if value >> index & 1 else ~plane
+        for index, plane in enumerate(planes)
+    ))
+
+
+def change_postings(recipe_id, added=(), removed=()):
+    ingredient_ids = sorted(set(added) | set(removed))
+    if not ingredient_ids:
+        return
+    with transaction.atomic():
+        IngredientPostings.objects.bulk_create(
+            [
+                IngredientPostings(ingredient_id=ingredient_id)
+                for ingredient_id in ingredient_ids
+            ],
+            ignore_conflicts=True
+        )
+        rows = list(
+            IngredientPostings.objects.select_for_update().filter(
+                ingredient_id__in=ingredient_ids
+            ).order_by('ingredient')
+        )
+        now = timezone.now()
+        bit = 1 << recipe_id
+        for row in rows:
+            bits = decode_bitset(row.recipes)
+            if row.ingredient_id in added:
+                bits |= bit
+            else:
+                bits &= ~bit
+            row.recipes = encode_bitset(bits)
+            row.updated = now
+        IngredientPostings.objects.bulk_update(rows, ['recipes', 'updated'])
+        transaction.on_commit(
+            lambda: bump_model_version(IngredientPostings)
+        )
+
+
+def rebuild_postings():
+    recipe_ids = {}
+    for ingredient_id, recipe_id in RecipeIngredient.objects.values_list(
+            'ingredient',
+            'recipe'
+    ).order_by().iterator():
+        recipe_ids.setdefault(ingredient_id, []).append(recipe_id)
+    now = timezone.now()
+    with transaction.atomic():
+        IngredientPostings.objects.all().delete()
+        IngredientPostings.objects.bulk_create(
+            [
+                IngredientPostings(
+                    ingredient_id=ingredient_id,
+                    recipes=encode_bitset(bitset_from_ids(ids)),
+                    updated=now
+                )
+                for ingredient_id, ids in recipe_ids.items()
+            ],
+            batch_size=CHUNK_SIZE
+        )
+        transaction.on_commit(
+            lambda: bump_model_version(IngredientPostings)
+        )
+    return len(recipe_ids)
+
+
+class IngredientMatches:
+    def __init__(self, buckets, mask=None):
+        if mask is not None:
+            buckets = [bucket & mask for bucket in buckets]
+        self.buckets = [bucket for bucket in buckets if bucket]
+        self.count = sum(popcount(bucket) for bucket in self.buckets)
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            raise TypeError('Only slices of matches are supported.')
+        start, stop, _ = item.indices(self.count)
+        skip, limit = start, stop - start
+        result = []
+        for bucket in self.buckets:
+            if limit <= 0:
+                break
+            size = popcount(bucket)
+            if skip >= size:
+                skip -= size
+                continue
+            # Recipes with the same coverage are returned newest first.
+            while bucket and limit > 0:
+                recipe_id = bucket.bit_length() - 1
+                bucket ^= 1 << recipe_id
+                if skip:
+                    skip -= 1
+                    continue
+                result.append(recipe_id)
+                limit -= 1
+        return result
+
+
+class IngredientMatcher:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = None
+        self._loaded_at = 0
+        self._watermark = None
+        self._version = None
+
+    def load_postings(self, postings):
+        size_planes = []
+        for bits in postings.values():
+            size_planes = add_to_counter(size_planes, bits)
+        self._state = (postings, size_planes, {})
+        return self._state
+
+    def apply_changes(self, changes):
+        postings, size_planes, _ = self._state
+        postings = dict(postings)
+        for ingredient_id, bits in changes.items():
+            old = postings.get(ingredient_id, 0)
+            if bits == old:
+                continue
+            size_planes = add_to_counter(size_planes, bits & ~old)
+            size_planes = subtract_from_counter(size_planes, old & ~bits)
+            postings[ingredient_id] = bits
+        self._state = (postings, size_planes, {})
+
+    def read_postings(self, since=None):
+        rows = IngredientPostings.objects.all()
+        if since is not None:
+            rows = rows.filter(updated__gte=since)
+        return {
+            ingredient_id: decode_bitset(data)
+            for ingredient_id, data in rows.values_list(
+                'ingredient', 'recipes'
+            ).iterator()
+        }
+
+    def refresh(self):
+        version = get_model_version(IngredientPostings)
+        if (
+                self._state is not None
+                and version == self._version
+                and time.monotonic() - self._loaded_at
+                < settings.INGREDIENT_MATCH_INDEX_TTL
+        ):
+            return self._state
+        with self._lock:
+            now = timezone.now()
+            if (
+                    self._state is None
+                    or time.monotonic() - self._loaded_at
+                    >= settings.INGREDIENT_MATCH_INDEX_TTL
+            ):
+                self.load_postings(self.read_postings())
+                self._loaded_at = time.monotonic()
+            elif version != self._version:
+                self.apply_changes(
+                    self.read_postings(since=self._watermark - REFRESH_LAG)
+                )
+            self._watermark = now
+            self._version = version
+            return self._state
+
+    def get_size_set(self, state, size):
+        postings, size_planes, size_sets = state
+        if size not in size_sets:
+            size_sets[size] = counter_equals(size_planes, size)
+        return size_sets[size]
+
+    def match(self, ingredient_ids, mode=MATCH_ALL, max_missing=0, mask=None,
+              state=None):
+        state = state or self.refresh()
+        postings, size_planes, _ = state
+        ingredient_ids = set(ingredient_ids)
+        lists = [postings.get(ingredient_id, 0) for ingredient_id in
+                 ingredient_ids]
+        count = len(lists)
+        max_size = (1 << len(size_planes)) - 1
+        buckets = []
+
+        if mode == MATCH_ALL:
+            remaining = reduce(and_, lists) if lists else 0
+            # Fewer ingredients beyond the requested ones is better coverage.
+            for size in range(count, max_size + 1):
+                if not remaining:
+                    break
+                bucket = remaining & self.get_size_set(state, size)
+                remaining ^= bucket
+                buckets.append(bucket)
+            return IngredientMatches(buckets, mask)
+
+        matched_planes = []
+        for bits in lists:
+            matched_planes = add_to_counter(matched_planes, bits)
+        matched_sets = {
+            matched: counter_equals(matched_planes, matched)
+            for matched in range(count, 0, -1)
+        }
+
+        if mode == MATCH_ANY:
+            for matched in range(count, 0, -1):
+                remaining = matched_sets[matched]
+                for size in range(matched, max_size + 1):
+                    if not remaining:
+                        break
+                    bucket = remaining & self.get_size_set(state, size)
+                    remaining ^= bucket
+                    buckets.append(bucket)
+        else:
+            # Ordered by the number of ingredients still to buy, then by the
+            # number of requested ingredients used.
+            for missing in range(max_missing + 1):
+                for matched in range(count, 0, -1):
+                    if matched_sets[matched]:
+                        buckets.append(
+                            matched_sets[matched] & self.get_size_set(
+                                state,
+                                matched + missing
+                            )
+                        )
+        return IngredientMatches(buckets, mask)
+
+
+ingredient_matcher = IngredientMatcher()
+
+
+def parse_match(value):
+    value = (value or MATCH_ALL).replace(' ', '')
+    if value in (MATCH_ALL, MATCH_ANY):
+        return value, 0
+    prefix = f'{MATCH_MISSING}<='
+    if value.startswith(prefix) and value[len(prefix):].isdigit():
+        max_missing = int(value[len(prefix):])
+        if max_missing <= settings.INGREDIENT_MATCH_MAX_MISSING:
+            return MATCH_MISSING, max_missing
+    raise ValueError(
+        f'match must be {MATCH_ALL}, {MATCH_ANY} or {MATCH_MISSING}<=N with '
+        f'N up to {settings.INGREDIENT_MATCH_MAX_MISSING}.'
+    )
+
+
+def parse_ingredient_ids(value):
+    ingredient_ids = [part.strip() for part in value.split(',')]
+    if not all(part.isdigit() for part in ingredient_ids):
+        raise ValueError('ingredients must be a comma separated list of ids.')
+    ingredient_ids = {int(part) for part in ingredient_ids}
+    if len(ingredient_ids) > settings.INGREDIENT_MATCH_MAX_INGREDIENTS:
+        raise ValueError(
+            f'Up to {settings.INGREDIENT_MATCH_MAX_INGREDIENTS} ingredients '
+            f'can be given.'
+        )
+    return ingredient_ids
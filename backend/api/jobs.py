@@ -0,0 +1,91 @@
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .images import (
+    delete_image, generate_image_variants, sweep_orphaned_images
+)
+from .models import Job
+
+
+def sweep_media():
+    sweep_orphaned_images()
+    schedule_media_sweep(
+        timezone.now() + timedelta(seconds=settings.MEDIA_SWEEP_INTERVAL)
+    )
+
+
+JOB_HANDLERS = {
+    'delete_image': delete_image,
+    'generate_image_variants': generate_image_variants,
+    'sweep_media': sweep_media,
+}
+
+
+def enqueue_job(kind, run_at=None, **payload):
+    # Jobs are plain rows, so a job queued inside a transaction only becomes
+    # visible to workers once that transaction commits.
+    return Job.objects.create(
+        kind=kind,
+        payload=payload,
+        run_at=run_at or timezone.now()
+    )
+
+
+def schedule_media_sweep(run_at=None):
+    if Job.objects.filter(
+            kind='sweep_media',
+            status=Job.PENDING,
+            run_at__gt=timezone.now()
+    ).exists():
+        return
+    enqueue_job('sweep_media', run_at=run_at)
+
+
+def claim_jobs(limit):
+    now = timezone.now()
+    # Jobs of a worker that died while running them are picked up again.
+    expired = now - timedelta(seconds=settings.JOB_LOCK_TIMEOUT)
+    with transaction.atomic():
+        jobs = list(
+            Job.objects.select_for_update(skip_locked=True).filter(
+                Q(status=Job.PENDING, run_at__lte=now)
+                | Q(status=Job.RUNNING, locked_at__lt=expired)
+            ).order_by('run_at', 'id')[:limit]
+        )
+        Job.objects.filter(id__in=[job.id for job in jobs]).update(
+            status=Job.RUNNING,
+            locked_at=now,
+            attempts=F('attempts') + 1
+        )
+    for job in jobs:
+        job.attempts += 1
+    return jobs
+
+
+def fail_job(job, error):
+    job.last_error = error
+    job.locked_at = None
+    if job.attempts >= settings.JOB_MAX_ATTEMPTS:
+        job.status = Job.FAILED
+    else:
+        job.status = Job.PENDING
+        job.run_at = timezone.now() + timedelta(
+            seconds=settings.JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+        )
+    job.save(update_fields=['last_error', 'locked_at', 'status', 'run_at'])
+
+
+def run_job(job):
+    try:
+        handler = JOB_HANDLERS[job.kind]
+        handler(**job.payload)
+    except Exception:
+        fail_job(job, traceback.format_exc())
+        return False
+    job.delete()
+    return True
@@ -0,0 +1,7 @@
+def percentile(values, fraction):
+    # Nearest-rank percentile, enough for the latency reports of the
+    # benchmark commands.
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
@@ -0,0 +1,82 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from api.models import FeedEntry, Follow, Recipe, UserStats
+
+CHUNK_SIZE = 200
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild subscription feeds from existing subscriptions and '
+        'recompute which authors are merged into feeds on read.'
+    )
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        followers_counts = dict(
+            Follow.objects.values('author').annotate(
+                total=Count('id')
+            ).order_by().values_list('author', 'total')
+        )
+        on_read = {
+            author_id for author_id, total in followers_counts.items()
+            if total >= settings.FEED_FANOUT_MAX_FOLLOWERS
+        }
+        existing_stats = set(
+            UserStats.objects.filter(
+                user_id__in=on_read
+            ).values_list('user', flat=True)
+        )
+        UserStats.objects.bulk_create([
+            UserStats(
+                user_id=author_id,
+                recipes_count=Recipe.objects.filter(
+                    author_id=author_id
+                ).count(),
+                followers_count=followers_counts[author_id]
+            )
+            for author_id in on_read - existing_stats
+        ])
+        UserStats.objects.exclude(user_id__in=on_read).update(
+            fan_out_on_read=False
+        )
+        UserStats.objects.filter(user_id__in=on_read).update(
+            fan_out_on_read=True
+        )
+
+        FeedEntry.objects.all().delete()
+        authors = sorted(set(followers_counts) - on_read)
+        created = 0
+        for start in range(0, len(authors), CHUNK_SIZE):
+            chunk = authors[start:start + CHUNK_SIZE]
+            followers = defaultdict(list)
+            for user_id, author_id in Follow.objects.filter(
+                    author_id__in=chunk
+            ).values_list('user', 'author'):
+                followers[author_id].append(user_id)
+            entries = [
+                FeedEntry(
+                    user_id=user_id,
+                    author_id=author_id,
+                    recipe_id=recipe_id,
+                    pub_date=pub_date
+                )
+                for recipe_id, author_id, pub_date in Recipe.objects.filter(
+                    author_id__in=chunk
+                ).latest_per_author(
+                    settings.FEED_BACKFILL_LIMIT
+                ).values_list('id', 'author', 'pub_date')
+                for user_id in followers[author_id]
+            ]
+            FeedEntry.objects.bulk_create(entries, batch_size=1000)
+            created += len(entries)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {created} feed entries for {len(authors)} authors, '
+            f'{len(on_read)} authors are merged into feeds on read.'
+        ))
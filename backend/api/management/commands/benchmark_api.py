@@ -0,0 +1,301 @@
+import base64
+import gc
+import io
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.ingredient_matching import rebuild_postings
+from api.management.benchmarking import percentile
+from api.models import (
+    Favourite, Follow, Ingredient, Recipe, RecipeIngredient, ShoppingCart,
+    Tag
+)
+from api.popularity import refresh_popularity
+
+User = get_user_model()
+
+INGREDIENT_WORDS = (
+    'мука', 'сахар', 'соль', 'масло', 'молоко', 'яйцо', 'капуста',
+    'морковь', 'лук', 'чеснок', 'картофель', 'свекла', 'говядина',
+    'курица', 'рис', 'гречка', 'сметана', 'сыр', 'перец', 'томат',
+)
+MEASUREMENT_UNITS = ('г', 'кг', 'мл', 'шт.', 'ст. л.', 'ч. л.')
+RECIPE_IMAGE = 'recipes/images/benchmark.png'
+
+
+def png_data_uri():
+    buffer = io.BytesIO()
+    Image.new('RGB', (64, 48), 'orange').save(buffer, 'PNG')
+    return 'data:image/png;base64,' + base64.b64encode(
+        buffer.getvalue()
+    ).decode()
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a throwaway test database and report the SQL query count and '
+        'latency of the main API endpoints. Query counts are enforced by '
+        'api/tests/test_query_counts.py, latency depends on the machine and '
+        'is only reported.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=30)
+        parser.add_argument('--recipes', type=int, default=300)
+        parser.add_argument('--ingredients', type=int, default=300)
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=3,
+            help='Unmeasured requests per endpoint, they fill the caches.'
+        )
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument(
+            '--endpoint',
+            action='append',
+            help='Only measure this endpoint, may be repeated.'
+        )
+
+    def handle(self, *args, **options):
+        media_root = tempfile.mkdtemp()
+        old_name = connection.settings_dict['NAME']
+        # Everything runs against a test database and private caches, so
+        # the benchmark never touches real data or shared state.
+        connection.creation.create_test_db(
+            verbosity=0,
+            autoclobber=True,
+            serialize=False
+        )
+        try:
+            with override_settings(
+                    MEDIA_ROOT=media_root,
+                    DATABASE_REPLICAS=[],
+                    CACHES={'default': {
+                        'BACKEND':
+                            'django.core.cache.backends.locmem.LocMemCache',
+                        'LOCATION': 'benchmark-api',
+                    }}
+            ):
+                self.rng = random.Random(options['seed'])
+                self.seed_data(options, media_root)
+                results = self.run_scenarios(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            shutil.rmtree(media_root, ignore_errors=True)
+        self.report(results)
+
+    def seed_data(self, options, media_root):
+        rng = self.rng
+        image_path = os.path.join(media_root, RECIPE_IMAGE)
+        os.makedirs(os.path.dirname(image_path))
+        Image.new('RGB', (1200, 900), 'orange').save(image_path, 'PNG')
+
+        self.users = [
+            User.objects.create_user(
+                username=f'user{number}',
+                email=f'user{number}@example.com',
+                password='benchmark-password',
+                first_name='Имя',
+                last_name='Фамилия'
+            )
+            for number in range(options['users'])
+        ]
+        self.tags = [
+            Tag.objects.create(
+                name=f'Тег {number}',
+                colour=f'#{number:06d}',
+                slug=f'tag{number}'
+            )
+            for number in range(6)
+        ]
+        Ingredient.objects.bulk_create([
+            Ingredient(
+                name=f'{INGREDIENT_WORDS[number % len(INGREDIENT_WORDS)]} '
+                     f'{number}',
+                measurement_unit=rng.choice(MEASUREMENT_UNITS)
+            )
+            for number in range(options['ingredients'])
+        ])
+        self.ingredients = list(Ingredient.objects.order_by('id'))
+
+        self.user = self.users[0]
+        for author in self.users[1:]:
+            Follow.objects.create(user=self.user, author=author)
+
+        self.recipes = []
+        recipe_ingredients = []
+        for number in range(options['recipes']):
+            recipe = Recipe.objects.create(
+                author=rng.choice(self.users),
+                name=f'Рецепт {number} {rng.choice(INGREDIENT_WORDS)}',
+                image=RECIPE_IMAGE,
+                text=' '.join(rng.choices(INGREDIENT_WORDS, k=30)),
+                cooking_time=rng.randint(5, 120)
+            )
+            recipe.tags.set(rng.sample(self.tags, rng.randint(1, 3)))
+            recipe_ingredients.extend(
+                RecipeIngredient(
+                    recipe=recipe,
+                    ingredient=ingredient,
+                    amount=rng.randint(1, 500)
+                )
+                for ingredient in rng.sample(
+                    self.ingredients,
+                    rng.randint(5, 12)
+                )
+            )
+            self.recipes.append(recipe)
+        RecipeIngredient.objects.bulk_create(recipe_ingredients)
+
+        for recipe in rng.sample(self.recipes, len(self.recipes) // 5):
+            Favourite.objects.create(user=self.user, recipe=recipe)
+        for recipe in rng.sample(self.recipes, 20):
+            ShoppingCart.objects.create(user=self.user, recipe=recipe)
+        rebuild_postings()
+        refresh_popularity()
+
+        self.client = APIClient()
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.own_recipe = Recipe.objects.filter(author=self.user).first()
+        if self.own_recipe is None:
+            raise CommandError('Seed at least two recipes per user.')
+
+    def get_scenarios(self):
+        recipe = self.recipes[len(self.recipes) // 2]
+        ingredient_ids = ','.join(
+            str(ingredient.id) for ingredient in self.ingredients[:3]
+        )
+        image = png_data_uri()
+
+        def recipe_body(iteration):
+            ingredients = self.rng.sample(self.ingredients, 8)
+            return {
+                'name': f'Новый рецепт {iteration}',
+                'text': 'Смешать и запечь.',
+                'cooking_time': 30,
+                'image': image,
+                'tags': [tag.id for tag in self.tags[:2]],
+                'ingredients': [
+                    {'id': ingredient.id, 'amount': 100}
+                    for ingredient in ingredients
+                ],
+            }
+
+        def update_body(iteration):
+            body = recipe_body(iteration)
+            del body['image']
+            return body
+
+        return (
+            ('recipe_list', 'get', '/api/recipes/?limit=10', None),
+            ('recipe_list_page', 'get', '/api/recipes/?limit=10&page=5',
+             None),
+            ('recipe_list_cursor', 'get',
+             '/api/recipes/?limit=10&pagination=cursor', None),
+            ('recipe_list_tags', 'get',
+             '/api/recipes/?limit=10&tags=tag1&tags=tag2', None),
+            ('recipe_list_author', 'get',
+             f'/api/recipes/?limit=10&author={self.users[1].id}', None),
+            ('recipe_list_favorited', 'get',
+             '/api/recipes/?limit=10&is_favorited=1', None),
+            ('recipe_list_shopping_cart', 'get',
+             '/api/recipes/?limit=10&is_in_shopping_cart=1', None),
+            ('recipe_list_search', 'get',
+             '/api/recipes/?limit=10&search=капуста', None),
+            ('recipe_list_ingredients', 'get',
+             f'/api/recipes/?limit=10&ingredients={ingredient_ids}'
+             f'&match=any', None),
+            ('recipe_popular', 'get', '/api/recipes/popular/?limit=10',
+             None),
+            ('recipe_feed', 'get', '/api/recipes/feed/?limit=10', None),
+            ('recipe_detail', 'get', f'/api/recipes/{recipe.id}/', None),
+            ('subscriptions', 'get',
+             '/api/users/subscriptions/?limit=6&recipes_limit=3', None),
+            ('download_shopping_cart', 'get',
+             '/api/recipes/download_shopping_cart/?file_format=txt', None),
+            ('ingredient_search', 'get', '/api/ingredients/?name=мук',
+             None),
+            ('recipe_create', 'post', '/api/recipes/', recipe_body),
+            ('recipe_update', 'patch',
+             f'/api/recipes/{self.own_recipe.id}/', update_body),
+        )
+
+    def run_scenarios(self, options):
+        results = {}
+        for name, method, path, body in self.get_scenarios():
+            if options['endpoint'] and name not in options['endpoint']:
+                continue
+            latencies = []
+            query_counts = []
+            for iteration in range(options['warmup'] + options['iterations']):
+                latency, queries = self.measure(
+                    name,
+                    method,
+                    path,
+                    body(iteration) if body else None
+                )
+                if iteration >= options['warmup']:
+                    latencies.append(latency)
+                    query_counts.append(queries)
+            results[name] = {
+                # The typical count, a single request that happens to
+                # refresh a cache does not decide the result.
+                'queries': statistics.median_low(query_counts),
+                'p50_ms': round(percentile(latencies, 0.5) * 1000, 2),
+                'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+            }
+        return results
+
+    def measure(self, name, method, path, body):
+        # Like timeit, garbage collection is kept out of the timed request,
+        # otherwise a single collection decides the p95.
+        gc.collect()
+        gc.disable()
+        try:
+            return self.timed_request(name, method, path, body)
+        finally:
+            gc.enable()
+
+    def timed_request(self, name, method, path, body):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            if body is None:
+                response = getattr(self.client, method)(path)
+            else:
+                response = getattr(self.client, method)(
+                    path,
+                    body,
+                    format='json'
+                )
+            if response.streaming:
+                b''.join(response.streaming_content)
+            latency = time.perf_counter() - started
+        if response.status_code >= 400:
+            raise CommandError(
+                f'{name}: {path} returned {response.status_code}.'
+            )
+        return latency, len(queries)
+
+    def report(self, results):
+        self.stdout.write(
+            f'{"endpoint":<28}{"queries":>9}{"p50 ms":>10}{"p95 ms":>10}'
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:<28}{result["queries"]:>9}'
+                f'{result["p50_ms"]:>10.2f}{result["p95_ms"]:>10.2f}'
+            )
@@ -0,0 +1,99 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.ingredient_matching import (
+    MATCH_ALL, MATCH_ANY, MATCH_MISSING, IngredientMatcher, bitset_from_ids
+)
+from api.management.benchmarking import percentile
+
+PAGE_SIZE = 10
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure ingredient matching on a synthetic in-memory catalogue, '
+        'without touching the database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=100000)
+        parser.add_argument('--ingredients', type=int, default=2000)
+        parser.add_argument(
+            '--queries',
+            type=int,
+            default=200,
+            help='Queries per match mode.'
+        )
+        parser.add_argument(
+            '--query-size',
+            type=int,
+            default=5,
+            help='Ingredients per query.'
+        )
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        ingredient_ids = range(1, options['ingredients'] + 1)
+        # Popularity follows a power law, like salt and onions versus rare
+        # spices in the real catalogue.
+        weights = [1 / rank for rank in ingredient_ids]
+        recipe_ids = {ingredient_id: [] for ingredient_id in ingredient_ids}
+        for recipe_id in range(1, options['recipes'] + 1):
+            used = set(
+                rng.choices(ingredient_ids, weights, k=rng.randint(8, 15))
+            )
+            for ingredient_id in used:
+                recipe_ids[ingredient_id].append(recipe_id)
+
+        started = time.perf_counter()
+        matcher = IngredientMatcher()
+        state = matcher.load_postings({
+            ingredient_id: bitset_from_ids(ids)
+            for ingredient_id, ids in recipe_ids.items()
+        })
+        self.stdout.write(
+            f'Index of {options["recipes"]} recipes built in '
+            f'{(time.perf_counter() - started) * 1000:.0f} ms'
+        )
+
+        queries = [
+            set(rng.choices(
+                ingredient_ids,
+                weights,
+                k=options['query_size']
+            ))
+            for _ in range(options['queries'])
+        ]
+        modes = (
+            (MATCH_ALL, MATCH_ALL, 0),
+            (MATCH_ANY, MATCH_ANY, 0),
+            (f'{MATCH_MISSING}<=2', MATCH_MISSING, 2),
+        )
+        self.stdout.write(
+            f'{"match":<14}{"p50 ms":>10}{"p95 ms":>10}'
+            f'{"max ms":>10}{"avg count":>12}'
+        )
+        for name, mode, max_missing in modes:
+            latencies = []
+            total = 0
+            for query in queries:
+                started = time.perf_counter()
+                matches = matcher.match(
+                    query,
+                    mode,
+                    max_missing,
+                    state=state
+                )
+                total += len(matches)
+                matches[:PAGE_SIZE]
+                latencies.append(time.perf_counter() - started)
+            self.stdout.write(
+                f'{name:<14}'
+                f'{percentile(latencies, 0.5) * 1000:>10.2f}'
+                f'{percentile(latencies, 0.95) * 1000:>10.2f}'
+                f'{max(latencies) * 1000:>10.2f}'
+                f'{total / len(queries):>12.0f}'
+            )
@@ -0,0 +1,159 @@
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from api.management.benchmarking import percentile
+
+DEFAULT_PATHS = (
+    '/api/recipes/?limit=10',
+    '/api/tags/',
+    '/api/ingredients/?name=сах',
+)
+MODES = ('wsgi', 'asgi')
+
+
+def get_free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure throughput and latency of the hot read endpoints under '
+        'concurrent load, comparing gunicorn sync workers (WSGI) with '
+        'uvicorn workers (ASGI).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--mode',
+            choices=MODES,
+            action='append',
+            help='Server mode to start, both by default.'
+        )
+        parser.add_argument(
+            '--url',
+            help='Benchmark an already running server instead.'
+        )
+        parser.add_argument('--workers', type=int, default=1)
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument(
+            '--duration',
+            type=float,
+            default=10,
+            help='Seconds of load per server, after a short warm-up.'
+        )
+        parser.add_argument(
+            '--path',
+            action='append',
+            help='Path to request, may be repeated.'
+        )
+
+    def handle(self, *args, **options):
+        paths = options['path'] or DEFAULT_PATHS
+        if options['url']:
+            results = [(
+                options['url'],
+                self.run_load(options['url'], paths, options)
+            )]
+        else:
+            results = [
+                (mode, self.benchmark_mode(mode, paths, options))
+                for mode in options['mode'] or MODES
+            ]
+
+        self.stdout.write(
+            f'{"server":<24}{"req/s":>10}{"p50 ms":>10}'
+            f'{"p95 ms":>10}{"p99 ms":>10}{"errors":>8}'
+        )
+        for name, (throughput, latencies, errors) in results:
+            self.stdout.write(
+                f'{name:<24}{throughput:>10.1f}'
+                f'{percentile(latencies, 0.5) * 1000:>10.1f}'
+                f'{percentile(latencies, 0.95) * 1000:>10.1f}'
+                f'{percentile(latencies, 0.99) * 1000:>10.1f}'
+                f'{errors:>8}'
+            )
+
+    def benchmark_mode(self, mode, paths, options):
+        port = get_free_port()
+        env = dict(
+            os.environ,
+            SERVER_MODE=mode,
+            GUNICORN_WORKERS=str(options['workers'])
+        )
+        server = subprocess.Popen(
+            [
+                sys.executable, '-m', 'gunicorn',
+                '--config', 'gunicorn.conf.py',
+                '--bind', f'127.0.0.1:{port}',
+                '--log-level', 'warning',
+            ],
+            cwd=settings.BASE_DIR,
+            env=env
+        )
+        url = f'http://127.0.0.1:{port}'
+        try:
+            self.wait_until_ready(url, paths[0])
+            return self.run_load(url, paths, options)
+        finally:
+            server.terminate()
+            server.wait()
+
+    def wait_until_ready(self, url, path, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                requests.get(url + path, timeout=5)
+                return
+            except requests.RequestException:
+                time.sleep(0.2)
+        raise CommandError(f'Server at {url} did not start.')
+
+    def run_load(self, url, paths, options):
+        latencies = []
+        errors = [0]
+        lock = threading.Lock()
+        warm_up_until = time.monotonic() + 1
+        stop_at = warm_up_until + options['duration']
+
+        def client(number):
+            session = requests.Session()
+            index = number
+            while True:
+                started = time.monotonic()
+                if started >= stop_at:
+                    return
+                try:
+                    response = session.get(url + paths[index % len(paths)])
+                    failed = response.status_code >= 400
+                except requests.RequestException:
+                    failed = True
+                index += 1
+                finished = time.monotonic()
+                if started < warm_up_until:
+                    continue
+                with lock:
+                    if failed:
+                        errors[0] += 1
+                    else:
+                        latencies.append(finished - started)
+
+        threads = [
+            threading.Thread(target=client, args=(number,))
+            for number in range(options['concurrency'])
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        return len(latencies) / options['duration'], latencies, errors[0]
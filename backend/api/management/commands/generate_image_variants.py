@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from sorl.thumbnail import delete
+
+from api.images import generate_image_variants
+from api.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Generate thumbnail, card and full variants of recipe images.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Delete existing variants and generate them again.'
+        )
+
+    def handle(self, *args, **options):
+        generated = failed = 0
+        for recipe in Recipe.objects.only('id', 'image').iterator():
+            if not recipe.image:
+                continue
+            try:
+                if options['force']:
+                    delete(recipe.image, delete_file=False)
+                generate_image_variants(recipe.image)
+            except (IOError, ValueError) as error:
+                failed += 1
+                self.stderr.write(f'Recipe {recipe.id}: {error}')
+            else:
+                generated += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated variants for {generated} images, {failed} failed.'
+        ))
@@ -0,0 +1,148 @@
+import csv
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.autocomplete import ingredient_index
+from api.caching import bump_model_version
+from api.models import Ingredient
+
+READ_SIZE = 64 * 1024
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if not row:
+            continue
+        if len(row) != 2:
+            raise CommandError(f'Unexpected CSV row: {row}')
+        yield row[0].strip(), row[1].strip()
+
+
+def read_json(file):
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+    eof = False
+    while True:
+        buffer = buffer.lstrip()
+        if not started:
+            if not buffer and not eof:
+                chunk = file.read(READ_SIZE)
+                eof = not chunk
+                buffer += chunk
+                continue
+            if not buffer:
+                return
+            if buffer[0] != '[':
+                raise CommandError('JSON catalogue must be an array.')
+            buffer = buffer[1:]
+            started = True
+            continue
+        if buffer[:1] == ',':
+            buffer = buffer[1:]
+            continue
+        if buffer[:1] == ']':
+            return
+        try:
+            item, index = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            if eof:
+                raise CommandError('JSON catalogue is truncated.')
+            chunk = file.read(READ_SIZE)
+            eof = not chunk
+            buffer += chunk
+            continue
+        buffer = buffer[index:]
+        try:
+            name = item.get('name', item.get('title')).strip()
+            measurement_unit = item.get(
+                'measurement_unit',
+                item.get('dimension')
+            ).strip()
+        except AttributeError:
+            raise CommandError(f'Unexpected JSON item: {item}')
+        yield name, measurement_unit
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+}
+
+
+def chunked(rows, size):
+    chunk = {}
+    for name, measurement_unit in rows:
+        chunk[name] = measurement_unit
+        if len(chunk) >= size:
+            yield chunk
+            chunk = {}
+    if chunk:
+        yield chunk
+
+
+class Command(BaseCommand):
+    help = 'Load the ingredient catalogue from a CSV or JSON file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Path to the catalogue file.')
+        parser.add_argument(
+            '--format',
+            choices=READERS.keys(),
+            help='File format, guessed from the extension by default.'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Number of rows written per batch.'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or os.path.splitext(
+            path
+        )[1].lstrip('.').lower()
+        if file_format not in READERS:
+            raise CommandError(f'Unsupported file format: {file_format}')
+
+        created = updated = total = 0
+        started = time.monotonic()
+        with open(path, encoding='utf-8', newline='') as file:
+            rows = READERS[file_format](file)
+            for chunk in chunked(rows, options['chunk_size']):
+                chunk_created, chunk_updated = self.write_chunk(chunk)
+                created += chunk_created
+                updated += chunk_updated
+                total += len(chunk)
+        ingredient_index.invalidate()
+        bump_model_version(Ingredient)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {total} ingredients in {elapsed:.2f}s '
+            f'({total / elapsed if elapsed else total:.0f} rows/s): '
+            f'{created} created, {updated} updated.'
+        ))
+
+    @transaction.atomic
+    def write_chunk(self, chunk):
+        existing = Ingredient.objects.filter(name__in=chunk.keys())
+        to_update = []
+        for ingredient in existing:
+            if ingredient.measurement_unit != chunk[ingredient.name]:
+                ingredient.measurement_unit = chunk[ingredient.name]
+                to_update.append(ingredient)
+        existing_names = {ingredient.name for ingredient in existing}
+        to_create = [
+            Ingredient(name=name, measurement_unit=measurement_unit)
+            for name, measurement_unit in chunk.items()
+            if name not in existing_names
+        ]
+        Ingredient.objects.bulk_update(to_update, ['measurement_unit'])
+        Ingredient.objects.bulk_create(to_create, ignore_conflicts=True)
+        return len(to_create), len(to_update)
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from api.ingredient_matching import rebuild_postings
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the ingredient postings used to match recipes by '
+        'ingredients from the recipe ingredients.'
+    )
+
+    def handle(self, *args, **options):
+        count = rebuild_postings()
+        self.stdout.write(
+            self.style.SUCCESS(f'Postings of {count} ingredients rebuilt.')
+        )
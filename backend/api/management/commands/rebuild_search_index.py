@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from api.search import INDEX_STATEMENTS
+
+
+class Command(BaseCommand):
+    help = (
+        'Recreate the full-text recipe search index. On SQLite this also '
+        'restores the triggers that are lost when a migration rebuilds the '
+        'recipe table.'
+    )
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        if connection.vendor not in INDEX_STATEMENTS:
+            self.stdout.write(
+                f'Full-text search is not supported on {connection.vendor}.'
+            )
+            return
+        create, drop = INDEX_STATEMENTS[connection.vendor]
+        with connection.cursor() as cursor:
+            for statement in drop + create:
+                cursor.execute(statement)
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt.'))
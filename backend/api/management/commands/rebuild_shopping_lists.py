@@ -0,0 +1,74 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.models import ShoppingListItem
+from api.shopping_cart import get_live_shopping_lists
+
+
+class Command(BaseCommand):
+    help = (
+        'Rebuild the materialized shopping lists from shopping carts '
+        'or check them against the live data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report differences, do not write anything.'
+        )
+
+    def handle(self, *args, **options):
+        live = {
+            (item['recipe__buyer__user'], item['ingredient']):
+                item['total_amount']
+            for item in get_live_shopping_lists().iterator()
+        }
+        stored = {
+            (user_id, ingredient_id): total_amount
+            for user_id, ingredient_id, total_amount
+            in ShoppingListItem.objects.values_list(
+                'user', 'ingredient', 'total_amount'
+            ).iterator()
+        }
+        mismatches = [
+            (key, stored.get(key), live.get(key))
+            for key in set(live) | set(stored)
+            if stored.get(key) != live.get(key)
+        ]
+
+        if options['check']:
+            for (user_id, ingredient_id), stored_amount, live_amount in sorted(
+                    mismatches, key=lambda item: item[0]
+            ):
+                self.stdout.write(
+                    f'user {user_id}, ingredient {ingredient_id}: '
+                    f'stored {stored_amount}, live {live_amount}'
+                )
+            if mismatches:
+                raise CommandError(
+                    f'{len(mismatches)} shopping list items are out of date.'
+                )
+            self.stdout.write(self.style.SUCCESS(
+                f'{len(stored)} shopping list items are up to date.'
+            ))
+            return
+
+        with transaction.atomic():
+            ShoppingListItem.objects.all().delete()
+            ShoppingListItem.objects.bulk_create(
+                [
+                    ShoppingListItem(
+                        user_id=user_id,
+                        ingredient_id=ingredient_id,
+                        total_amount=total_amount
+                    )
+                    for (user_id, ingredient_id), total_amount
+                    in live.items()
+                ],
+                batch_size=1000
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {len(live)} shopping list items, '
+            f'fixed {len(mismatches)}.'
+        ))
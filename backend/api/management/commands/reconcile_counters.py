@@ -0,0 +1,84 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api.counters import get_live_recipe_counters, get_live_user_counts
+from api.models import Recipe, UserStats
+
+
+class Command(BaseCommand):
+    help = (
+        'Fix drift of the denormalized favourites, shopping cart, '
+        'author recipes and followers counters.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report differences, do not write anything.'
+        )
+
+    def handle(self, *args, **options):
+        recipes = []
+        for (
+                recipe_id, favorites_count, cart_count,
+                live_favorites_count, live_cart_count
+        ) in get_live_recipe_counters().iterator():
+            if (
+                    favorites_count != live_favorites_count
+                    or cart_count != live_cart_count
+            ):
+                self.stdout.write(
+                    f'recipe {recipe_id}: favourites {favorites_count} -> '
+                    f'{live_favorites_count}, carts {cart_count} -> '
+                    f'{live_cart_count}'
+                )
+                recipes.append(Recipe(
+                    id=recipe_id,
+                    favorites_count=live_favorites_count,
+                    cart_count=live_cart_count
+                ))
+
+        live = get_live_user_counts()
+        fields = list(live)
+        stored = {
+            values[0]: dict(zip(fields, values[1:]))
+            for values in UserStats.objects.values_list('user', *fields)
+        }
+        user_ids = set(stored)
+        for counts in live.values():
+            user_ids |= set(counts)
+        users = []
+        for user_id in user_ids:
+            counts = {field: live[field].get(user_id, 0) for field in fields}
+            if counts != stored.get(user_id):
+                self.stdout.write(
+                    f'user {user_id}: {stored.get(user_id)} -> {counts}'
+                )
+                users.append(UserStats(user_id=user_id, **counts))
+
+        mismatches = len(recipes) + len(users)
+        if options['check']:
+            if mismatches:
+                raise CommandError(f'{mismatches} counters are out of date.')
+            self.stdout.write(self.style.SUCCESS('Counters are up to date.'))
+            return
+
+        with transaction.atomic():
+            Recipe.objects.bulk_update(
+                recipes,
+                ['favorites_count', 'cart_count'],
+                batch_size=1000
+            )
+            UserStats.objects.bulk_update(
+                [stats for stats in users if stats.user_id in stored],
+                fields,
+                batch_size=1000
+            )
+            UserStats.objects.bulk_create(
+                [stats for stats in users if stats.user_id not in stored],
+                batch_size=1000
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Fixed {mismatches} counters.'
+        ))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.popularity import refresh_popularity
+
+
+class Command(BaseCommand):
+    help = (
+        'Fold new favourites and shopping cart additions into the '
+        'popular recipes ranking.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval',
+            type=int,
+            default=0,
+            help='Keep running and refresh every INTERVAL seconds.'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            updated = refresh_popularity()
+            self.stdout.write(f'Updated scores of {updated} recipes.')
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,57 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from api.jobs import claim_jobs, run_job, schedule_media_sweep
+
+
+class Command(BaseCommand):
+    help = (
+        'Process background jobs: image deletion, image variant generation '
+        'and the periodic sweep of orphaned media files.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit once there are no jobs ready to run.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10,
+            help='Number of jobs claimed at a time.'
+        )
+
+    def handle(self, *args, **options):
+        schedule_media_sweep()
+        done = failed = 0
+        try:
+            while True:
+                # There are no request signals here, persistent connections
+                # are recycled and health checked between polls instead.
+                close_old_connections()
+                jobs = claim_jobs(options['batch_size'])
+                if not jobs:
+                    if options['once']:
+                        break
+                    time.sleep(settings.JOB_POLL_INTERVAL)
+                    continue
+                for job in jobs:
+                    if run_job(job):
+                        done += 1
+                    else:
+                        failed += 1
+                        self.stderr.write(
+                            f'Job {job.kind} #{job.id} failed '
+                            f'(attempt {job.attempts}):\n{job.last_error}'
+                        )
+        except KeyboardInterrupt:
+            pass
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Processed {done + failed} jobs, {failed} failed.'
+        ))
@@ -0,0 +1,28 @@
+from django.db import migrations
+
+CREATE_INDEX = (
+    'CREATE INDEX IF NOT EXISTS api_ingredient_name_upper_like '
+    'ON api_ingredient (UPPER(name::text) text_pattern_ops)'
+)
+DROP_INDEX = 'DROP INDEX IF EXISTS api_ingredient_name_upper_like'
+
+
+def create_pattern_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(CREATE_INDEX)
+
+
+def drop_pattern_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(DROP_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_pattern_index, drop_pattern_index),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 3.1.7 on 2026-10-18 16:46
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('api', 'Recipe')
+    UserStats = apps.get_model('api', 'UserStats')
+    for recipe in Recipe.objects.annotate(
+            live_favorites_count=models.Count('favorited_by', distinct=True),
+            live_cart_count=models.Count('buyer', distinct=True)
+    ).iterator():
+        Recipe.objects.filter(id=recipe.id).update(
+            favorites_count=recipe.live_favorites_count,
+            cart_count=recipe.live_cart_count
+        )
+    UserStats.objects.bulk_create(
+        [
+            UserStats(user_id=item['author'], recipes_count=item['total'])
+            for item in Recipe.objects.values('author').annotate(
+                total=models.Count('id')
+            ).order_by()
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('api', '0004_recipe_pub_date_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='User')),
+                ('recipes_count', models.PositiveIntegerField(default=0, verbose_name='Recipes count')),
+            ],
+            options={
+                'verbose_name': 'User statistics',
+                'verbose_name_plural': 'Users statistics',
+            },
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='cart_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Times added to shopping carts'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Times added to favourites'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
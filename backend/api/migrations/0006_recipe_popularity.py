@@ -0,0 +1,54 @@
+# Generated by Django 3.1.7 on 2026-10-18 16:47
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_recipe_counters_userstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PopularityRefresh',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('epoch', models.DateTimeField(verbose_name='Score epoch')),
+                ('refreshed_at', models.DateTimeField(null=True, verbose_name='Events processed up to')),
+            ],
+            options={
+                'verbose_name': 'Popularity refresh state',
+                'verbose_name_plural': 'Popularity refresh states',
+            },
+        ),
+        migrations.CreateModel(
+            name='RecipePopularity',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='popularity', serialize=False, to='api.recipe', verbose_name='Recipe')),
+                ('score', models.FloatField(default=0, verbose_name='Score')),
+            ],
+            options={
+                'verbose_name': 'Recipe popularity',
+                'verbose_name_plural': 'Recipes popularity',
+            },
+        ),
+        migrations.AddField(
+            model_name='favourite',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=django.utils.timezone.now, verbose_name='Creation date'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='shoppingcart',
+            name='created',
+            field=models.DateTimeField(auto_now_add=True, db_index=True, default=django.utils.timezone.now, verbose_name='Creation date'),
+            preserve_default=False,
+        ),
+        migrations.AddIndex(
+            model_name='recipepopularity',
+            index=models.Index(fields=['-score', '-recipe'], name='recipe_popularity_score_idx'),
+        ),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 3.1.7 on 2026-10-18 16:49
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_followers_counts(apps, schema_editor):
+    Follow = apps.get_model('api', 'Follow')
+    UserStats = apps.get_model('api', 'UserStats')
+    counts = dict(
+        Follow.objects.values('author').annotate(
+            total=models.Count('id')
+        ).order_by().values_list('author', 'total')
+    )
+    existing = set(UserStats.objects.values_list('user', flat=True))
+    for author_id, total in counts.items():
+        if author_id in existing:
+            UserStats.objects.filter(user_id=author_id).update(
+                followers_count=total
+            )
+    UserStats.objects.bulk_create(
+        [
+            UserStats(user_id=author_id, followers_count=total)
+            for author_id, total in counts.items()
+            if author_id not in existing
+        ],
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('api', '0006_recipe_popularity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='fan_out_on_read',
+            field=models.BooleanField(default=False, verbose_name='Recipes are pulled into feeds on read'),
+        ),
+        migrations.AddField(
+            model_name='userstats',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Followers count'),
+        ),
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(verbose_name='Publication date')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Author')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='api.recipe', verbose_name='Recipe')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'verbose_name': 'Feed entry',
+                'verbose_name_plural': 'Feed entries',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['user', '-pub_date', '-recipe'], name='feed_entry_user_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='feedentry',
+            index=models.Index(fields=['user', 'author'], name='feed_entry_user_author_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='feedentry',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_user_feed_recipe'),
+        ),
+        migrations.RunPython(
+            fill_followers_counts,
+            migrations.RunPython.noop
+        ),
+    ]
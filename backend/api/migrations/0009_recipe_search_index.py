@@ -0,0 +1,68 @@
+from django.db import migrations
+
+POSTGRESQL_INDEX = (
+    'ALTER TABLE api_recipe ADD COLUMN IF NOT EXISTS search_vector tsvector '
+    'GENERATED ALWAYS AS ('
+    "setweight(to_tsvector('russian', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('russian', coalesce(text, '')), 'B')"
+    ') STORED',
+    'CREATE INDEX IF NOT EXISTS recipe_search_vector_idx '
+    'ON api_recipe USING GIN (search_vector)',
+)
+POSTGRESQL_DROP_INDEX = (
+    'ALTER TABLE api_recipe DROP COLUMN IF EXISTS search_vector',
+)
+SQLITE_INDEX = (
+    'CREATE VIRTUAL TABLE IF NOT EXISTS api_recipe_fts USING fts5('
+    "name, text, content='api_recipe', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    'CREATE TRIGGER IF NOT EXISTS api_recipe_fts_insert '
+    'AFTER INSERT ON api_recipe BEGIN '
+    'INSERT INTO api_recipe_fts(rowid, name, text) '
+    'VALUES (new.id, new.name, new.text); END',
+    'CREATE TRIGGER IF NOT EXISTS api_recipe_fts_delete '
+    'AFTER DELETE ON api_recipe BEGIN '
+    'INSERT INTO api_recipe_fts(api_recipe_fts, rowid, name, text) '
+    "VALUES ('delete', old.id, old.name, old.text); END",
+    'CREATE TRIGGER IF NOT EXISTS api_recipe_fts_update '
+    'AFTER UPDATE OF name, text ON api_recipe BEGIN '
+    'INSERT INTO api_recipe_fts(api_recipe_fts, rowid, name, text) '
+    "VALUES ('delete', old.id, old.name, old.text); "
+    'INSERT INTO api_recipe_fts(rowid, name, text) '
+    'VALUES (new.id, new.name, new.text); END',
+    "INSERT INTO api_recipe_fts(api_recipe_fts) VALUES ('rebuild')",
+)
+SQLITE_DROP_INDEX = (
+    'DROP TRIGGER IF EXISTS api_recipe_fts_insert',
+    'DROP TRIGGER IF EXISTS api_recipe_fts_delete',
+    'DROP TRIGGER IF EXISTS api_recipe_fts_update',
+    'DROP TABLE IF EXISTS api_recipe_fts',
+)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {'postgresql': POSTGRESQL_INDEX, 'sqlite': SQLITE_INDEX}
+    for statement in statements.get(vendor, ()):
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    statements = {
+        'postgresql': POSTGRESQL_DROP_INDEX,
+        'sqlite': SQLITE_DROP_INDEX
+    }
+    for statement in statements.get(vendor, ()):
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_jobs'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
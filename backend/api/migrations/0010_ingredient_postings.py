@@ -0,0 +1,50 @@
+# Generated by Django 3.1.7 on 2026-10-18 17:07
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import zlib
+
+
+def fill_postings(apps, schema_editor):
+    RecipeIngredient = apps.get_model('api', 'RecipeIngredient')
+    IngredientPostings = apps.get_model('api', 'IngredientPostings')
+    recipe_ids = {}
+    for ingredient_id, recipe_id in RecipeIngredient.objects.values_list(
+            'ingredient',
+            'recipe'
+    ).order_by().iterator():
+        recipe_ids.setdefault(ingredient_id, []).append(recipe_id)
+    rows = []
+    for ingredient_id, ids in recipe_ids.items():
+        data = bytearray(max(ids) // 8 + 1)
+        for recipe_id in ids:
+            data[recipe_id >> 3] |= 1 << (recipe_id & 7)
+        rows.append(IngredientPostings(
+            ingredient_id=ingredient_id,
+            recipes=zlib.compress(bytes(data).rstrip(b'\0'))
+        ))
+    IngredientPostings.objects.bulk_create(rows, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_recipe_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngredientPostings',
+            fields=[
+                ('ingredient', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='postings', serialize=False, to='api.ingredient', verbose_name='Ingredient')),
+                ('recipes', models.BinaryField(default=bytes, verbose_name='Recipes')),
+                ('updated', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Updated')),
+            ],
+            options={
+                'verbose_name': 'Ingredient postings',
+                'verbose_name_plural': 'Ingredient postings',
+            },
+        ),
+        migrations.RunPython(fill_postings, migrations.RunPython.noop),
+    ]
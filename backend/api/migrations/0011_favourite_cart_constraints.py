@@ -0,0 +1,41 @@
+# Generated by Django 3.1.7 on 2026-10-18 17:09
+
+from django.db import migrations, models
+
+
+def remove_duplicates(apps, schema_editor):
+    # Rows added twice by concurrent requests, only the first one is kept.
+    for model_name in ('Favourite', 'ShoppingCart'):
+        model = apps.get_model('api', model_name)
+        duplicates = model.objects.values('user', 'recipe').annotate(
+            first_id=models.Min('id'),
+            rows=models.Count('id')
+        ).filter(rows__gt=1)
+        for duplicate in duplicates.iterator():
+            model.objects.filter(
+                user=duplicate['user'],
+                recipe=duplicate['recipe']
+            ).exclude(id=duplicate['first_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_ingredient_postings'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-pub_date', '-id'], name='recipe_author_pub_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='favourite',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_favourite_user_recipe'),
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcart',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_shopping_cart_user_recipe'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.1.7 on 2026-10-18 17:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_favourite_cart_constraints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModelVersion',
+            fields=[
+                ('label', models.CharField(max_length=100, primary_key=True, serialize=False, verbose_name='Model')),
+                ('version', models.BigIntegerField(verbose_name='Version')),
+            ],
+            options={
+                'verbose_name': 'Model version',
+                'verbose_name_plural': 'Model versions',
+            },
+        ),
+    ]
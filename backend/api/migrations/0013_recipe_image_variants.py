@@ -0,0 +1,32 @@
+# Generated by Django 3.1.7 on 2026-10-18 17:30
+
+from django.db import migrations, models
+
+from api.search import SQLITE_INDEX
+
+
+def restore_search_triggers(apps, schema_editor):
+    # SQLite adds the column by rebuilding api_recipe, which drops the
+    # triggers that keep the full-text index in sync.
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in SQLITE_INDEX:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_model_versions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='Image variant URLs'),
+        ),
+        migrations.RunPython(
+            restore_search_triggers,
+            migrations.RunPython.noop
+        ),
+    ]
@@ -1,6 +1,9 @@
 from django.db import models
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import RowNumber
 from django.core.validators import MinValueValidator, RegexValidator
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 User = get_user_model()
 
@@ -53,6 +56,70 @@ class Tag(models.Model):
         verbose_name_plural = 'Tags'
 
 
+class RecipeQuerySet(models.QuerySet):
+    def with_related(self):
+        return self.select_related('author').prefetch_related(
+            'tags',
+            models.Prefetch(
+                'recipe_ingredients',
+                queryset=RecipeIngredient.objects.select_related(
+                    'ingredient'
+                )
+            )
+        )
+
+    def latest_per_author(self, limit):
+        ranked = self.annotate(
+            recipe_rank=models.Window(
+                expression=RowNumber(),
+                partition_by=[models.F('author_id')],
+                order_by=[models.F('pub_date').desc(), models.F('id').desc()]
+            )
+        ).order_by().values('id', 'recipe_rank')
+        sql, params = ranked.query.sql_with_params()
+        return self.filter(
+            id__in=RawSQL(
+                f'SELECT ranked.id FROM ({sql}) ranked '
+                f'WHERE ranked.recipe_rank <= %s',
+                (*params, limit)
+            )
+        )
+
+    def with_user_flags(self, user):
+        if not user.is_authenticated:
+            return self.annotate(
+                is_favorited=models.Value(
+                    False, output_field=models.BooleanField()
+                ),
+                is_in_shopping_cart=models.Value(
+                    False, output_field=models.BooleanField()
+                ),
+                is_author_subscribed=models.Value(
+                    False, output_field=models.BooleanField()
+                )
+            )
+        return self.annotate(
+            is_favorited=models.Exists(
+                Favourite.objects.filter(
+                    user=user,
+                    recipe=models.OuterRef('pk')
+                )
+            ),
+            is_in_shopping_cart=models.Exists(
+                ShoppingCart.objects.filter(
+                    user=user,
+                    recipe=models.OuterRef('pk')
+                )
+            ),
+            is_author_subscribed=models.Exists(
+                Follow.objects.filter(
+                    user=user,
+                    author=models.OuterRef('author')
+                )
+            )
+        )
+
+
 class Recipe(models.Model):
     author = models.ForeignKey(
         User,
@@ -95,12 +162,77 @@ class Recipe(models.Model):
         auto_now=True,
         verbose_name='Publication date'
     )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Times added to favourites'
+    )
+    cart_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Times added to shopping carts'
+    )
+    image_variants = models.JSONField(
+        default=dict,
+        blank=True,
+        editable=False,
+        verbose_name='Image variant URLs'
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Recipe'
         verbose_name_plural = 'Recipes'
 
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(
+                fields=['-pub_date', '-id'],
+                name='recipe_pub_date_id_idx'
+            ),
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='recipe_author_pub_date_idx'
+            )
+        ]
+
+    _stored_image = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._stored_image = instance.__dict__.get('image')
+        return instance
+
+    def image_changed(self):
+        if 'image' not in self.__dict__:
+            return False
+        return self.image.name != self._stored_image
+
+    def save(self, *args, **kwargs):
+        # Variants belong to the previous image until the job generates
+        # the new ones, so they are dropped together with it.
+        image_changed = self.image_changed()
+        if image_changed:
+            self.image_variants = {}
+        # Counters are only changed with F() updates and variants are stored
+        # by the image job, a regular save of a previously loaded instance
+        # must not overwrite them.
+        if (
+                self.pk is not None
+                and not self._state.adding
+                and not kwargs.get('force_insert')
+                and 'update_fields' not in kwargs
+        ):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in ('favorites_count', 'cart_count')
+                and (field.name != 'image_variants' or image_changed)
+            ]
+        super().save(*args, **kwargs)
+        self._stored_image = self.image.name
 
 
 class RecipeIngredient(models.Model):
@@ -152,11 +284,23 @@ class Favourite(models.Model):
         null=False,
         verbose_name='Recipe'
     )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Creation date'
+    )
 
     class Meta:
         verbose_name = 'Adding to favourites'
         verbose_name_plural = 'Addings to favourites'
 
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_favourite_user_recipe'
+            )
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -205,7 +349,269 @@ class ShoppingCart(models.Model):
         null=False,
         verbose_name='Recipe'
     )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Creation date'
+    )
 
     class Meta:
         verbose_name = 'Shopping cart element'
         verbose_name_plural = 'Shopping cart elements'
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_shopping_cart_user_recipe'
+            )
+        ]
+
+
+class ShoppingListItem(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        blank=False,
+        null=False,
+        verbose_name='User'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        blank=False,
+        null=False,
+        verbose_name='Ingredient'
+    )
+    total_amount = models.IntegerField(
+        blank=False,
+        null=False,
+        verbose_name='Total ingredient amount'
+    )
+
+    class Meta:
+        verbose_name = 'Shopping list item'
+        verbose_name_plural = 'Shopping list items'
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_user_ingredient'
+            )
+        ]
+
+
+class RecipePopularity(models.Model):
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='popularity',
+        verbose_name='Recipe'
+    )
+    score = models.FloatField(
+        default=0,
+        verbose_name='Score'
+    )
+
+    class Meta:
+        verbose_name = 'Recipe popularity'
+        verbose_name_plural = 'Recipes popularity'
+
+        indexes = [
+            models.Index(
+                fields=['-score', '-recipe'],
+                name='recipe_popularity_score_idx'
+            )
+        ]
+
+
+class PopularityRefresh(models.Model):
+    epoch = models.DateTimeField(
+        verbose_name='Score epoch'
+    )
+    refreshed_at = models.DateTimeField(
+        null=True,
+        verbose_name='Events processed up to'
+    )
+
+    class Meta:
+        verbose_name = 'Popularity refresh state'
+        verbose_name_plural = 'Popularity refresh states'
+
+
+class UserStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='User'
+    )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Recipes count'
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Followers count'
+    )
+    fan_out_on_read = models.BooleanField(
+        default=False,
+        verbose_name='Recipes are pulled into feeds on read'
+    )
+
+    class Meta:
+        verbose_name = 'User statistics'
+        verbose_name_plural = 'Users statistics'
+
+
+class FeedEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        blank=False,
+        null=False,
+        verbose_name='User'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        blank=False,
+        null=False,
+        verbose_name='Author'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        blank=False,
+        null=False,
+        verbose_name='Recipe'
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Publication date'
+    )
+
+    class Meta:
+        verbose_name = 'Feed entry'
+        verbose_name_plural = 'Feed entries'
+
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_user_feed_recipe'
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-recipe'],
+                name='feed_entry_user_pub_date_idx'
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='feed_entry_user_author_idx'
+            )
+        ]
+
+
+class Job(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (FAILED, 'Failed'),
+    )
+
+    kind = models.CharField(
+        max_length=50,
+        verbose_name='Kind'
+    )
+    payload = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name='Payload'
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=PENDING,
+        verbose_name='Status'
+    )
+    run_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Run at'
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Attempts'
+    )
+    locked_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Locked at'
+    )
+    last_error = models.TextField(
+        blank=True,
+        verbose_name='Last error'
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Created'
+    )
+
+    class Meta:
+        verbose_name = 'Job'
+        verbose_name_plural = 'Jobs'
+
+        indexes = [
+            models.Index(
+                fields=['status', 'run_at'],
+                name='job_status_run_at_idx'
+            )
+        ]
+
+
+class IngredientPostings(models.Model):
+    ingredient = models.OneToOneField(
+        Ingredient,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='postings',
+        verbose_name='Ingredient'
+    )
+    # zlib compressed little-endian bitset, bit N is set when the recipe
+    # with id N uses the ingredient.
+    recipes = models.BinaryField(
+        default=bytes,
+        verbose_name='Recipes'
+    )
+    updated = models.DateTimeField(
+        default=timezone.now,
+        db_index=True,
+        verbose_name='Updated'
+    )
+
+    class Meta:
+        verbose_name = 'Ingredient postings'
+        verbose_name_plural = 'Ingredient postings'
+
+
+class ModelVersion(models.Model):
+    label = models.CharField(
+        max_length=100,
+        primary_key=True,
+        verbose_name='Model'
+    )
+    version = models.BigIntegerField(
+        verbose_name='Version'
+    )
+
+    class Meta:
+        verbose_name = 'Model version'
+        verbose_name_plural = 'Model versions'
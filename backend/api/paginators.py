@@ -1,5 +1,178 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import json
+from collections import OrderedDict
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .feed import get_feed_page
 
 
 class VariablePageSizePaginator(PageNumberPagination):
     page_size_query_param = 'limit'
+
+
+class IngredientMatchPaginator(VariablePageSizePaginator):
+    # Pages over IngredientMatches, which only fetches the ids of the
+    # requested page out of the bitsets.
+    page_size = 10
+    max_page_size = 100
+
+
+class KeysetPaginator(BasePagination):
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    page_size = 10
+    max_page_size = 100
+    ordering = ('-id',)
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = getattr(view, 'keyset_ordering', self.ordering)
+        self.fields = [field.lstrip('-') for field in self.ordering]
+        self.page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request)
+
+        self.count = self.get_count(queryset)
+        ordering = self.ordering
+        if reverse:
+            ordering = [self.flip(field) for field in ordering]
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.after(ordering, position))
+
+        page = list(queryset[:self.page_size + 1])
+        has_more = len(page) > self.page_size
+        page = page[:self.page_size]
+        if reverse:
+            page.reverse()
+
+        self.next_position = self.previous_position = None
+        if page and (has_more or reverse):
+            self.next_position = self.get_position(page[-1])
+        if page and (has_more or not reverse) and position is not None:
+            self.previous_position = self.get_position(page[0])
+        return page
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('next', self.get_link(self.next_position, False)),
+            ('previous', self.get_link(self.previous_position, True)),
+            ('results', data)
+        ]))
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def get_count(self, queryset):
+        cap = settings.KEYSET_PAGINATION_COUNT_CAP
+        if not cap:
+            return None
+        return queryset.order_by()[:cap].count()
+
+    def flip(self, field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    def after(self, ordering, position):
+        conditions = []
+        for index, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            equal = {
+                self.fields[previous]: position[previous]
+                for previous in range(index)
+            }
+            conditions.append(
+                Q(**equal, **{f'{name}__{lookup}': position[index]})
+            )
+        return reduce(or_, conditions)
+
+    def get_position(self, instance):
+        position = []
+        for field in self.fields:
+            value = getattr(instance, field)
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            position.append(value)
+        return position
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            data = json.loads(
+                base64.urlsafe_b64decode(cursor.encode()).decode()
+            )
+            position, reverse = data['p'], bool(data['r'])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(
+                self.fields
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, position, reverse):
+        data = json.dumps({'p': position, 'r': int(reverse)})
+        return base64.urlsafe_b64encode(data.encode()).decode()
+
+    def get_link(self, position, reverse):
+        if position is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(position, reverse)
+        )
+
+
+class OptionalKeysetPaginator(BasePagination):
+    pagination_query_param = 'pagination'
+    keyset_class = KeysetPaginator
+    default_class = VariablePageSizePaginator
+
+    def use_keyset(self, request):
+        return (
+            request.query_params.get(self.pagination_query_param) == 'cursor'
+            or self.keyset_class.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.use_keyset(request):
+            self.delegate = self.keyset_class()
+        else:
+            self.delegate = self.default_class()
+        return self.delegate.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.delegate.get_paginated_response(data)
+
+
+class FeedPaginator(KeysetPaginator):
+    def paginate_feed(self, user, request):
+        self.request = request
+        self.fields = ['pub_date', 'id']
+        self.page_size = self.get_page_size(request)
+        position, reverse = self.decode_cursor(request)
+
+        rows, has_more = get_feed_page(user, position, self.page_size)
+        self.count = None
+        self.previous_position = None
+        self.next_position = None
+        if has_more:
+            pub_date, recipe_id = rows[-1]
+            self.next_position = [pub_date.isoformat(), recipe_id]
+        return [recipe_id for pub_date, recipe_id in rows]
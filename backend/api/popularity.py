@@ -0,0 +1,127 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, FloatField, Value, When
+from django.utils import timezone
+
+from .models import (
+    Favourite, PopularityRefresh, RecipePopularity, ShoppingCart
+)
+
+# Scores are kept relative to an epoch ("forward decay"): an event adds
+# weight * 2 ** ((created - epoch) / half_life), which keeps the ranking of
+# time-decayed scores without ever touching old rows. The epoch is moved
+# forward once the exponents grow large.
+REBASE_HALF_LIVES = 64
+PRUNE_SCORE = 1e-6
+CHUNK_SIZE = 500
+
+
+def get_half_life():
+    return settings.POPULARITY_HALF_LIFE_HOURS * 3600
+
+
+def get_event_score(created, epoch, weight):
+    return weight * 2 ** ((created - epoch).total_seconds() / get_half_life())
+
+
+def get_event_weights():
+    return {
+        Favourite: settings.POPULARITY_FAVOURITE_WEIGHT,
+        ShoppingCart: settings.POPULARITY_CART_WEIGHT,
+    }
+
+
+def rebase(state, now):
+    factor = 2 ** (-(now - state.epoch).total_seconds() / get_half_life())
+    RecipePopularity.objects.update(score=F('score') * factor)
+    RecipePopularity.objects.filter(score__lt=PRUNE_SCORE).delete()
+    state.epoch = now
+
+
+def collect_increments(state, until):
+    increments = defaultdict(float)
+    for model, weight in get_event_weights().items():
+        events = model.objects.filter(created__lte=until)
+        if state.refreshed_at is not None:
+            events = events.filter(created__gt=state.refreshed_at)
+        for recipe_id, created in events.values_list(
+                'recipe', 'created'
+        ).iterator():
+            increments[recipe_id] += get_event_score(
+                created, state.epoch, weight
+            )
+    return increments
+
+
+def apply_increments(increments):
+    recipe_ids = list(increments)
+    for start in range(0, len(recipe_ids), CHUNK_SIZE):
+        chunk = recipe_ids[start:start + CHUNK_SIZE]
+        # Missing rows are inserted empty, so a single update adds every
+        # increment of the chunk.
+        RecipePopularity.objects.bulk_create(
+            [RecipePopularity(recipe_id=recipe_id) for recipe_id in chunk],
+            ignore_conflicts=True
+        )
+        RecipePopularity.objects.filter(recipe_id__in=chunk).update(
+            score=F('score') + Case(
+                *[
+                    When(
+                        recipe_id=recipe_id,
+                        then=Value(increments[recipe_id])
+                    )
+                    for recipe_id in chunk
+                ],
+                default=Value(0.0),
+                output_field=FloatField()
+            )
+        )
+
+
+def withdraw_event(event):
+    # A deleted favourite or cart entry takes back the score it added,
+    # otherwise adding and removing a recipe over and over inflates it.
+    # The state is read without a lock, so deletions never wait for each
+    # other or for a refresh. An event deleted while a refresh counts it
+    # may keep its score.
+    state = PopularityRefresh.objects.first()
+    if (
+            state is None
+            or state.refreshed_at is None
+            or event.created > state.refreshed_at
+    ):
+        return
+    score = get_event_score(
+        event.created,
+        state.epoch,
+        get_event_weights()[type(event)]
+    )
+    popularity = RecipePopularity.objects.filter(recipe_id=event.recipe_id)
+    popularity.update(score=F('score') - score)
+    popularity.filter(score__lt=PRUNE_SCORE).delete()
+
+
+@transaction.atomic
+def refresh_popularity(now=None):
+    now = now or timezone.now()
+    # Events are picked up with a delay so rows from transactions that are
+    # still open when the watermark moves are not skipped.
+    until = now - timedelta(seconds=settings.POPULARITY_REFRESH_LAG)
+    state = PopularityRefresh.objects.select_for_update().first()
+    if state is None:
+        state = PopularityRefresh.objects.create(epoch=now)
+    if state.refreshed_at is not None and until <= state.refreshed_at:
+        return 0
+    if (now - state.epoch).total_seconds() > (
+            REBASE_HALF_LIVES * get_half_life()
+    ):
+        rebase(state, now)
+
+    increments = collect_increments(state, until)
+    apply_increments(increments)
+    state.refreshed_at = until
+    state.save()
+    return len(increments)
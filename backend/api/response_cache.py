@@ -0,0 +1,121 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+
+class LocalMemoryBackend:
+    def __init__(self, max_entries=1000, timeout=60):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get_generation(self):
+        return self._generation
+
+    def bump_generation(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.timeout)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class RedisBackend:
+    # Eviction is left to the server's maxmemory-policy; any client class
+    # with the redis-py interface (e.g. fakeredis.FakeRedis) can be used.
+    def __init__(self, url='redis://localhost:6379/0', timeout=60,
+                 prefix='foodgram:recipes', client_class='redis.Redis'):
+        self.client = import_string(client_class).from_url(url)
+        self.timeout = timeout
+        self.prefix = prefix
+
+    def get_generation(self):
+        key = f'{self.prefix}:generation'
+        generation = self.client.get(key)
+        if generation is None:
+            # Start from a timestamp so a lost counter never revives
+            # entries written under an older generation.
+            self.client.set(key, int(time.time() * 1000), nx=True)
+            generation = self.client.get(key)
+        return int(generation)
+
+    def bump_generation(self):
+        self.get_generation()
+        self.client.incr(f'{self.prefix}:generation')
+
+    def get(self, key):
+        value = self.client.get(f'{self.prefix}:{key}')
+        if value is None:
+            return None
+        return value.decode()
+
+    def set(self, key, value):
+        self.client.set(f'{self.prefix}:{key}', value, ex=self.timeout)
+
+
+class ResponseCache:
+    def __init__(self, setting_name):
+        self.setting_name = setting_name
+        self._backend = None
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            config = getattr(settings, self.setting_name)
+            self._backend = import_string(config['BACKEND'])(
+                **config.get('OPTIONS', {})
+            )
+        return self._backend
+
+    def reset(self):
+        self._backend = None
+
+    def make_key(self, request):
+        params = sorted(
+            (key, value)
+            for key in request.query_params
+            for value in sorted(set(request.query_params.getlist(key)))
+        )
+        return (
+            f'{self.backend.get_generation()}:{request.scheme}:'
+            f'{request.get_host()}:{request.path}?{urlencode(params)}'
+        )
+
+    def get(self, key):
+        value = self.backend.get(key)
+        if value is None:
+            return None
+        return json.loads(value)
+
+    def set(self, key, data):
+        self.backend.set(key, json.dumps(data))
+
+    def invalidate(self):
+        self.backend.bump_generation()
+
+
+recipe_list_cache = ResponseCache('RECIPE_LIST_CACHE')
@@ -0,0 +1,106 @@
+import re
+
+from django.db import connection
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+# Text search configuration of the generated search_vector column, changing
+# it requires a migration that recreates the column.
+SEARCH_CONFIG = 'russian'
+MAX_SEARCH_TERMS = 10
+
+POSTGRESQL_INDEX = (
+    'ALTER TABLE api_recipe ADD COLUMN IF NOT EXISTS search_vector tsvector '
+    'GENERATED ALWAYS AS ('
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(name, '')), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(text, '')), 'B')"
+    ') STORED',
+    'CREATE INDEX IF NOT EXISTS recipe_search_vector_idx '
+    'ON api_recipe USING GIN (search_vector)',
+)
+POSTGRESQL_DROP_INDEX = (
+    'ALTER TABLE api_recipe DROP COLUMN IF EXISTS search_vector',
+)
+
+# An external content FTS5 table: it only stores the index, rows are read
+# from api_recipe, and triggers keep it in sync.
+SQLITE_INDEX = (
+    'CREATE VIRTUAL TABLE IF NOT EXISTS api_recipe_fts USING fts5('
+    "name, text, content='api_recipe', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    'CREATE TRIGGER IF NOT EXISTS api_recipe_fts_insert '
+    'AFTER INSERT ON api_recipe BEGIN '
+    'INSERT INTO api_recipe_fts(rowid, name, text) '
+    'VALUES (new.id, new.name, new.text); END',
+    'CREATE TRIGGER IF NOT EXISTS api_recipe_fts_delete '
+    'AFTER DELETE ON api_recipe BEGIN '
+    'INSERT INTO api_recipe_fts(api_recipe_fts, rowid, name, text) '
+    "VALUES ('delete', old.id, old.name, old.text); END",
+    'CREATE TRIGGER IF NOT EXISTS api_recipe_fts_update '
+    'AFTER UPDATE OF name, text ON api_recipe BEGIN '
+    'INSERT INTO api_recipe_fts(api_recipe_fts, rowid, name, text) '
+    "VALUES ('delete', old.id, old.name, old.text); "
+    'INSERT INTO api_recipe_fts(rowid, name, text) '
+    'VALUES (new.id, new.name, new.text); END',
+    "INSERT INTO api_recipe_fts(api_recipe_fts) VALUES ('rebuild')",
+)
+SQLITE_DROP_INDEX = (
+    'DROP TRIGGER IF EXISTS api_recipe_fts_insert',
+    'DROP TRIGGER IF EXISTS api_recipe_fts_delete',
+    'DROP TRIGGER IF EXISTS api_recipe_fts_update',
+    'DROP TABLE IF EXISTS api_recipe_fts',
+)
+INDEX_STATEMENTS = {
+    'postgresql': (POSTGRESQL_INDEX, POSTGRESQL_DROP_INDEX),
+    'sqlite': (SQLITE_INDEX, SQLITE_DROP_INDEX),
+}
+
+
+def get_search_terms(value):
+    return re.findall(r'\w+', value.lower())[:MAX_SEARCH_TERMS]
+
+
+def search_recipes(queryset, value):
+    # Every term has to match, the last one may be incomplete. Terms only
+    # contain word characters, so they are safe in both query syntaxes.
+    terms = get_search_terms(value)
+    if not terms:
+        return queryset.none().annotate(
+            search_rank=Value(0.0, output_field=FloatField())
+        )
+
+    if connection.vendor == 'postgresql':
+        query = ' & '.join(f'{term}:*' for term in terms)
+        matches = RawSQL(
+            'SELECT id FROM api_recipe '
+            'WHERE search_vector @@ to_tsquery(%s::regconfig, %s)',
+            (SEARCH_CONFIG, query)
+        )
+        rank = RawSQL(
+            'ts_rank(api_recipe.search_vector, '
+            'to_tsquery(%s::regconfig, %s))',
+            (SEARCH_CONFIG, query),
+            output_field=FloatField()
+        )
+    elif connection.vendor == 'sqlite':
+        query = ' '.join(f'"{term}"*' for term in terms)
+        matches = RawSQL(
+            'SELECT rowid FROM api_recipe_fts WHERE api_recipe_fts MATCH %s',
+            (query,)
+        )
+        # bm25() is lower for better matches, name weighs more than text.
+        rank = RawSQL(
+            '(SELECT -bm25(api_recipe_fts, 10.0, 1.0) FROM api_recipe_fts '
+            'WHERE api_recipe_fts MATCH %s AND rowid = api_recipe.id)',
+            (query,),
+            output_field=FloatField()
+        )
+    else:
+        condition = Q()
+        for term in terms:
+            condition &= Q(name__icontains=term) | Q(text__icontains=term)
+        return queryset.filter(condition).annotate(
+            search_rank=Value(0.0, output_field=FloatField())
+        )
+
+    return queryset.filter(id__in=matches).annotate(search_rank=rank)
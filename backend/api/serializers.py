@@ -1,21 +1,32 @@
-import os
-
 from rest_framework import serializers
 from django.contrib.auth import get_user_model
+from django.db import transaction
 from django.core.validators import MaxLengthValidator, MinValueValidator
 
 from .models import Recipe, Tag, Ingredient, RecipeIngredient
-from backend.settings import MEDIA_ROOT
-from .fields import CustomImageField
+from .fields import (
+    BatchedListSerializer, BatchedPrimaryKeyRelatedField, CustomImageField
+)
+from .images import get_image_variant_urls
+from .ingredient_matching import change_postings
+from .jobs import enqueue_job
+from .shopping_cart import update_recipe_in_shopping_lists
 from .validators import unique_username_validator, unique_email_validator
 
 User = get_user_model()
 
 
 class RecipesReadSerializer(serializers.ModelSerializer):
+    image_variants = serializers.SerializerMethodField(
+        method_name='get_image_variants'
+    )
+
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
+
+    def get_image_variants(self, obj):
+        return get_image_variant_urls(obj, self.context.get('request'))
 
 
 class UserReadSerializer(serializers.ModelSerializer):
@@ -33,6 +44,8 @@ class UserReadSerializer(serializers.ModelSerializer):
     def get_is_subscribed(self, obj):
         if not self.context.get('request').user.is_authenticated:
             return False
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         return self.context.get('request').user.follower.filter(
             author=obj
         ).exists()
@@ -110,19 +123,24 @@ class UserSubscriptionSerializer(serializers.ModelSerializer):
         )
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         return self.context.get('request').user.follower.filter(
             author=obj
         ).exists()
 
     def get_recipes(self, obj):
-        recipes_limit = self.context.get('request').GET.get(
-            'recipes_limit',
-            None
-        )
-        if recipes_limit is not None:
-            recipes = obj.recipes.all()[:int(recipes_limit)]
+        if hasattr(obj, 'subscription_recipes'):
+            recipes = obj.subscription_recipes
         else:
-            recipes = obj.recipes.all()
+            recipes_limit = self.context.get('request').GET.get(
+                'recipes_limit',
+                None
+            )
+            if recipes_limit is not None:
+                recipes = obj.recipes.all()[:int(recipes_limit)]
+            else:
+                recipes = obj.recipes.all()
 
         serializer = RecipesReadSerializer(
             recipes,
@@ -132,16 +150,11 @@ class UserSubscriptionSerializer(serializers.ModelSerializer):
         return serializer.data
 
     def get_recipes_count(self, obj):
-        recipes_limit = self.context.get('request').GET.get(
-            'recipes_limit',
-            None
-        )
-        recipes_number = self.context.get(
-            'request'
-        ).user.recipes.all().count()
-        if recipes_limit is None or int(recipes_limit) >= recipes_number:
-            return recipes_number
-        return recipes_limit
+        if hasattr(obj, 'recipes_count'):
+            return obj.recipes_count
+        if hasattr(obj, 'stats'):
+            return obj.stats.recipes_count
+        return obj.recipes.count()
 
 
 class TagsSerializer(serializers.ModelSerializer):
@@ -157,7 +170,7 @@ class IngredientsSerializer(serializers.ModelSerializer):
 
 
 class CreateRecipeIngredientsSerializer(serializers.Serializer):
-    id = serializers.PrimaryKeyRelatedField(
+    id = BatchedPrimaryKeyRelatedField(
         queryset=Ingredient.objects.all(),
         required=True
     )
@@ -165,6 +178,9 @@ class CreateRecipeIngredientsSerializer(serializers.Serializer):
         required=True
     )
 
+    class Meta:
+        list_serializer_class = BatchedListSerializer
+
 
 class RecipesCreateSerializer(serializers.Serializer):
     ingredients = CreateRecipeIngredientsSerializer(
@@ -174,7 +190,7 @@ class RecipesCreateSerializer(serializers.Serializer):
     image = CustomImageField(required=True)
     text = serializers.CharField(required=True)
     name = serializers.CharField(required=True)
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = BatchedPrimaryKeyRelatedField(
         many=True,
         queryset=Tag.objects.all(),
         required=True
@@ -229,6 +245,52 @@ class RecipesCreateSerializer(serializers.Serializer):
             raise serializers.ValidationError('Tags field may not be blank.')
         return value
 
+    def set_ingredients(self, recipe, ingredients):
+        current = {
+            recipe_ingredient.ingredient_id: recipe_ingredient
+            for recipe_ingredient in recipe.recipe_ingredients.all()
+        }
+        old_amounts = {
+            ingredient_id: recipe_ingredient.amount
+            for ingredient_id, recipe_ingredient in current.items()
+        }
+        new_amounts = {
+            elem['id'].id: elem['amount'] for elem in ingredients
+        }
+
+        to_update = []
+        for ingredient_id, recipe_ingredient in current.items():
+            if ingredient_id not in new_amounts:
+                continue
+            if recipe_ingredient.amount != new_amounts[ingredient_id]:
+                recipe_ingredient.amount = new_amounts[ingredient_id]
+                to_update.append(recipe_ingredient)
+
+        to_delete = [
+            recipe_ingredient.key
+            for ingredient_id, recipe_ingredient in current.items()
+            if ingredient_id not in new_amounts
+        ]
+        if to_delete:
+            # Nothing references these rows, and the caller refreshes the
+            # shopping lists once for all removed ingredients instead of
+            # the per-row post_delete receiver.
+            removed = RecipeIngredient.objects.filter(key__in=to_delete)
+            removed._raw_delete(removed.db)
+        if to_update:
+            RecipeIngredient.objects.bulk_update(to_update, ['amount'])
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(
+                recipe=recipe,
+                ingredient_id=ingredient_id,
+                amount=amount
+            )
+            for ingredient_id, amount in new_amounts.items()
+            if ingredient_id not in current
+        ])
+        return old_amounts, new_amounts
+
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
@@ -236,16 +298,18 @@ class RecipesCreateSerializer(serializers.Serializer):
             'request'
         ).user, **validated_data)
         recipe.tags.set(tags)
-        recipe.save()
-        for elem in ingredients:
-            ingredient = elem.pop('id')
-            RecipeIngredient.objects.create(
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(
                 recipe=recipe,
-                ingredient=ingredient,
-                **elem
+                ingredient=elem['id'],
+                amount=elem['amount']
             )
+            for elem in ingredients
+        ])
+        change_postings(recipe.id, {elem['id'].id for elem in ingredients})
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         instance.text = validated_data.get('text', instance.text)
         if 'tags' in validated_data:
@@ -257,23 +321,31 @@ class RecipesCreateSerializer(serializers.Serializer):
         )
         instance.name = validated_data.get('name', instance.name)
         if 'image' in validated_data:
-            try:
-                os.remove(MEDIA_ROOT + '/' + str(instance.image))
-            except PermissionError:
-                pass
+            if instance.image:
+                enqueue_job('delete_image', image=instance.image.name)
             instance.image = validated_data['image']
         instance.save()
 
         if 'ingredients' in validated_data:
-            instance.recipe_ingredients.all().delete()
-            ingredients = validated_data.get('ingredients')
-            for elem in ingredients:
-                ingredient = elem.pop('id')
-                RecipeIngredient.objects.create(
-                    recipe=instance,
-                    ingredient=ingredient,
-                    **elem
-                )
+            old_amounts, new_amounts = self.set_ingredients(
+                instance,
+                validated_data['ingredients']
+            )
+            # set_ingredients writes without signals, so one refresh covers
+            # every changed, added and removed ingredient.
+            changed = {
+                ingredient_id
+                for ingredient_id in old_amounts.keys() | new_amounts.keys()
+                if old_amounts.get(ingredient_id)
+                != new_amounts.get(ingredient_id)
+            }
+            if changed:
+                update_recipe_in_shopping_lists(instance.id, changed)
+            change_postings(
+                instance.id,
+                new_amounts.keys() - old_amounts.keys(),
+                old_amounts.keys() - new_amounts.keys()
+            )
         return instance
 
 
@@ -318,13 +390,15 @@ class RecipesListSerializer(serializers.ModelSerializer):
         many=True,
         read_only=True
     )
-    author = UserReadSerializer(
-        read_only=True,
-        context='get_context'
+    author = serializers.SerializerMethodField(
+        method_name='get_author'
     )
     image = serializers.SerializerMethodField(
         method_name='get_image'
     )
+    image_variants = serializers.SerializerMethodField(
+        method_name='get_image_variants'
+    )
     is_favorited = serializers.SerializerMethodField(
         method_name='get_is_favorited'
     )
@@ -337,12 +411,14 @@ class RecipesListSerializer(serializers.ModelSerializer):
         fields = (
             'id', 'tags', 'author',
             'ingredients', 'is_favorited', 'is_in_shopping_cart',
-            'name', 'image', 'text',
+            'name', 'image', 'image_variants', 'text',
             'cooking_time'
         )
 
-    def get_context(self):
-        return {'request': self.context}
+    def get_author(self, obj):
+        if hasattr(obj, 'is_author_subscribed'):
+            obj.author.is_subscribed = obj.is_author_subscribed
+        return UserReadSerializer(obj.author, context=self.context).data
 
     def get_image(self, obj):
         if self.context.get('request').is_secure():
@@ -351,9 +427,14 @@ class RecipesListSerializer(serializers.ModelSerializer):
         return 'http://' + str(self.context.get(
             'request').get_host()) + str(obj.image.url)
 
+    def get_image_variants(self, obj):
+        return get_image_variant_urls(obj, self.context.get('request'))
+
     def get_is_favorited(self, obj):
         if not self.context.get('request').user.is_authenticated:
             return False
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
         return self.context.get('request').user.user_favorites.filter(
             recipe=obj
         ).exists()
@@ -361,6 +442,8 @@ class RecipesListSerializer(serializers.ModelSerializer):
     def get_is_in_shopping_cart(self, obj):
         if not self.context.get('request').user.is_authenticated:
             return False
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
         return self.context.get('request').user.shop_list.filter(
             recipe=obj
         ).exists()
@@ -0,0 +1,185 @@
+import csv
+import json
+from collections import defaultdict
+
+from django.db.models import F, Sum
+
+from .models import RecipeIngredient, ShoppingCart, ShoppingListItem
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def get_shopping_list(user):
+    return ShoppingListItem.objects.filter(
+        user=user
+    ).values(
+        'ingredient__name',
+        'ingredient__measurement_unit',
+        'total_amount'
+    ).order_by('ingredient__name')
+
+
+def get_live_shopping_lists():
+    return RecipeIngredient.objects.filter(
+        recipe__buyer__isnull=False
+    ).values(
+        'recipe__buyer__user',
+        'ingredient'
+    ).annotate(
+        total_amount=Sum('amount')
+    ).order_by()
+
+
+def get_recipe_amounts(recipe_id):
+    return dict(
+        RecipeIngredient.objects.filter(recipe=recipe_id).values_list(
+            'ingredient',
+            'amount'
+        )
+    )
+
+
+def update_shopping_lists(user_ids, deltas):
+    user_ids = list(user_ids)
+    deltas = {key: value for key, value in deltas.items() if value}
+    if not user_ids or not deltas:
+        return
+
+    # Missing rows are inserted empty and every amount is then changed with
+    # an F() update, so concurrent additions to the same item all count.
+    ShoppingListItem.objects.bulk_create(
+        [
+            ShoppingListItem(
+                user_id=user_id,
+                ingredient_id=ingredient_id,
+                total_amount=0
+            )
+            for user_id in user_ids
+            for ingredient_id, delta in deltas.items()
+            if delta > 0
+        ],
+        ignore_conflicts=True
+    )
+    ingredients_by_delta = defaultdict(list)
+    for ingredient_id, delta in deltas.items():
+        ingredients_by_delta[delta].append(ingredient_id)
+    for delta, ingredient_ids in ingredients_by_delta.items():
+        ShoppingListItem.objects.filter(
+            user__in=user_ids,
+            ingredient__in=ingredient_ids
+        ).update(total_amount=F('total_amount') + delta)
+    ShoppingListItem.objects.filter(
+        user__in=user_ids,
+        total_amount__lte=0
+    ).delete()
+
+
+def refresh_shopping_lists(user_ids, ingredient_ids=None):
+    # Recomputes the given items from the carts. Unlike a delta it can run
+    # more than once for the same change, which happens when a cascade
+    # deletes both the cart entries and the ingredients of a recipe.
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    items = ShoppingListItem.objects.filter(user__in=user_ids)
+    live = RecipeIngredient.objects.filter(
+        recipe__buyer__user__in=user_ids
+    )
+    if ingredient_ids is not None:
+        items = items.filter(ingredient__in=ingredient_ids)
+        live = live.filter(ingredient__in=ingredient_ids)
+    totals = {
+        (item['recipe__buyer__user'], item['ingredient']):
+            item['total_amount']
+        for item in live.values(
+            'recipe__buyer__user',
+            'ingredient'
+        ).annotate(total_amount=Sum('amount')).order_by()
+    }
+
+    to_update = []
+    to_delete = []
+    for item in items:
+        key = (item.user_id, item.ingredient_id)
+        if key not in totals:
+            to_delete.append(item.id)
+        elif item.total_amount != totals[key]:
+            item.total_amount = totals[key]
+            to_update.append(item)
+        totals.pop(key, None)
+    if to_delete:
+        ShoppingListItem.objects.filter(id__in=to_delete).delete()
+    if to_update:
+        ShoppingListItem.objects.bulk_update(to_update, ['total_amount'])
+    ShoppingListItem.objects.bulk_create(
+        [
+            ShoppingListItem(
+                user_id=user_id,
+                ingredient_id=ingredient_id,
+                total_amount=total_amount
+            )
+            for (user_id, ingredient_id), total_amount in totals.items()
+        ],
+        ignore_conflicts=True
+    )
+
+
+def get_recipe_buyers(recipe_id):
+    return ShoppingCart.objects.filter(recipe=recipe_id).values_list(
+        'user',
+        flat=True
+    )
+
+
+def add_to_shopping_list(user_id, recipe_id):
+    update_shopping_lists([user_id], get_recipe_amounts(recipe_id))
+
+
+def update_recipe_in_shopping_lists(recipe_id, ingredient_ids):
+    refresh_shopping_lists(get_recipe_buyers(recipe_id), ingredient_ids)
+
+
+def txt_lines(items):
+    for item in items:
+        yield (
+            f'· {item["ingredient__name"]} '
+            f'({item["ingredient__measurement_unit"]}) - '
+            f'{item["total_amount"]}\n'
+        ).capitalize()
+
+
+def csv_lines(items):
+    writer = csv.writer(Echo())
+    yield writer.writerow(['name', 'measurement_unit', 'amount'])
+    for item in items:
+        yield writer.writerow([
+            item['ingredient__name'],
+            item['ingredient__measurement_unit'],
+            item['total_amount']
+        ])
+
+
+def json_lines(items):
+    yield '['
+    separator = ''
+    for item in items:
+        yield separator + json.dumps(
+            {
+                'name': item['ingredient__name'],
+                'measurement_unit': item['ingredient__measurement_unit'],
+                'amount': item['total_amount']
+            },
+            ensure_ascii=False
+        )
+        separator = ','
+    yield ']'
+
+
+FILE_FORMATS = {
+    'txt': (txt_lines, 'text/plain', 'txt'),
+    'csv': (csv_lines, 'text/csv', 'csv'),
+    'json': (json_lines, 'application/json', 'json'),
+}
@@ -0,0 +1,172 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete
+)
+from django.dispatch import receiver
+
+from .autocomplete import ingredient_index
+from .caching import bump_model_version
+from .counters import change_recipe_counter, change_user_counter
+from .feed import (
+    add_author_to_feed, fan_out_recipe, remove_author_from_feed,
+    update_recipe_entries
+)
+from .ingredient_matching import change_postings
+from .jobs import enqueue_job
+from .popularity import withdraw_event
+from .models import (
+    Favourite, Follow, Ingredient, Recipe, RecipeIngredient, ShoppingCart,
+    Tag
+)
+from .response_cache import recipe_list_cache
+from .shopping_cart import (
+    add_to_shopping_list, get_recipe_buyers, refresh_shopping_lists
+)
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_ingredient_index(sender, **kwargs):
+    ingredient_index.invalidate()
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def bump_catalogue_version(sender, **kwargs):
+    bump_model_version(sender)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=User)
+def invalidate_recipe_list_cache(sender, **kwargs):
+    transaction.on_commit(recipe_list_cache.invalidate)
+
+
+@receiver(post_save, sender=User)
+def invalidate_recipe_list_cache_for_author(sender, update_fields, **kwargs):
+    # Logging in saves last_login only, which the lists do not render.
+    if update_fields is not None and not set(update_fields) & {
+            'username', 'first_name', 'last_name', 'email'
+    }:
+        return
+    transaction.on_commit(recipe_list_cache.invalidate)
+
+
+@receiver(post_save, sender=Favourite)
+def increment_favorites_count(sender, instance, created, **kwargs):
+    if created:
+        change_recipe_counter(instance.recipe_id, 'favorites_count', 1)
+
+
+@receiver(post_delete, sender=Favourite)
+def decrement_favorites_count(sender, instance, **kwargs):
+    change_recipe_counter(instance.recipe_id, 'favorites_count', -1)
+
+
+@receiver(post_save, sender=ShoppingCart)
+def increment_cart_count(sender, instance, created, **kwargs):
+    if created:
+        change_recipe_counter(instance.recipe_id, 'cart_count', 1)
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def decrement_cart_count(sender, instance, **kwargs):
+    change_recipe_counter(instance.recipe_id, 'cart_count', -1)
+
+
+@receiver(post_delete, sender=Favourite)
+@receiver(post_delete, sender=ShoppingCart)
+def withdraw_popularity(sender, instance, **kwargs):
+    withdraw_event(instance)
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_recipe_to_shopping_list(sender, instance, created, **kwargs):
+    if created:
+        add_to_shopping_list(instance.user_id, instance.recipe_id)
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def remove_recipe_from_shopping_list(sender, instance, **kwargs):
+    # The recipe ingredients may already be gone when the entry is deleted
+    # by a cascade, so the whole list of the user is recomputed.
+    refresh_shopping_lists([instance.user_id])
+
+
+@receiver(post_save, sender=RecipeIngredient)
+@receiver(post_delete, sender=RecipeIngredient)
+def update_recipe_ingredient_in_shopping_lists(sender, instance, **kwargs):
+    refresh_shopping_lists(
+        get_recipe_buyers(instance.recipe_id),
+        [instance.ingredient_id]
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def increment_recipes_count(sender, instance, created, **kwargs):
+    if created:
+        change_user_counter(instance.author_id, 'recipes_count', 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def decrement_recipes_count(sender, instance, **kwargs):
+    change_user_counter(instance.author_id, 'recipes_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def add_follow(sender, instance, created, **kwargs):
+    if created:
+        change_user_counter(instance.author_id, 'followers_count', 1)
+        add_author_to_feed(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def remove_follow(sender, instance, **kwargs):
+    change_user_counter(instance.author_id, 'followers_count', -1)
+    remove_author_from_feed(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Recipe)
+def update_feeds(sender, instance, created, **kwargs):
+    if created:
+        fan_out_recipe(instance)
+    else:
+        update_recipe_entries(instance)
+
+
+@receiver(post_save, sender=Recipe)
+def queue_image_variants(sender, instance, created, update_fields, **kwargs):
+    if not instance.image:
+        return
+    if update_fields is not None and 'image' not in update_fields:
+        return
+    if created or instance.image_changed():
+        enqueue_job('generate_image_variants', image=instance.image.name)
+
+
+@receiver(post_delete, sender=Recipe)
+def queue_image_deletion(sender, instance, **kwargs):
+    if instance.image:
+        enqueue_job('delete_image', image=instance.image.name)
+
+
+@receiver(pre_delete, sender=Recipe)
+def remove_recipe_postings(sender, instance, **kwargs):
+    change_postings(
+        instance.id,
+        removed=instance.recipe_ingredients.values_list(
+            'ingredient',
+            flat=True
+        )
+    )
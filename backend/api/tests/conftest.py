@@ -0,0 +1,70 @@
+import pytest
+from django.contrib.auth import get_user_model
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from api.models import Ingredient, Recipe, RecipeIngredient, Tag
+
+User = get_user_model()
+
+
+@pytest.fixture
+def user(db):
+    return User.objects.create_user(
+        username='cook',
+        email='cook@example.com',
+        password='cook-password',
+        first_name='Имя',
+        last_name='Фамилия'
+    )
+
+
+@pytest.fixture
+def token(user):
+    return Token.objects.create(user=user)
+
+
+@pytest.fixture
+def client(token):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+@pytest.fixture
+def anonymous_client(db):
+    return APIClient()
+
+
+@pytest.fixture
+def tag(db):
+    return Tag.objects.create(
+        name='Завтрак',
+        colour='#E26C2D',
+        slug='breakfast'
+    )
+
+
+@pytest.fixture
+def ingredients(db):
+    return [
+        Ingredient.objects.create(name=name, measurement_unit='г')
+        for name in ('мука', 'сахар', 'молоко')
+    ]
+
+
+@pytest.fixture
+def recipe(user, tag, ingredients):
+    recipe = Recipe.objects.create(
+        author=user,
+        name='Блины',
+        image='recipes/images/pancakes.png',
+        text='Смешать и пожарить.',
+        cooking_time=20
+    )
+    recipe.tags.add(tag)
+    RecipeIngredient.objects.bulk_create([
+        RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=100)
+        for ingredient in ingredients
+    ])
+    return recipe
@@ -0,0 +1,48 @@
+import importlib
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient, override_settings
+from django.urls import clear_url_caches
+
+import api.urls
+
+
+@pytest.fixture
+def async_urls():
+    with override_settings(API_ASYNC_VIEWS=True):
+        importlib.reload(api.urls)
+        clear_url_caches()
+        yield
+    importlib.reload(api.urls)
+    clear_url_caches()
+
+
+@async_to_sync
+async def get(path, token=None):
+    # AsyncClient in Django 3.1 takes raw ASGI header names.
+    headers = {}
+    if token is not None:
+        headers['authorization'] = f'Token {token.key}'
+    return await AsyncClient().get(path, **headers)
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize('path', (
+    '/api/recipes/popular/',
+    '/api/recipes/feed/',
+    '/api/recipes/download_shopping_cart/',
+))
+def test_list_actions_are_not_shadowed(async_urls, token, recipe, path):
+    assert get(path, token).status_code == 200
+
+
+@pytest.mark.django_db(transaction=True)
+def test_anonymous_list_action(async_urls, recipe):
+    assert get('/api/recipes/popular/').status_code == 200
+
+
+@pytest.mark.django_db(transaction=True)
+def test_detail_views(async_urls, token, recipe, tag):
+    assert get(f'/api/recipes/{recipe.id}/', token).status_code == 200
+    assert get(f'/api/tags/{tag.id}/').status_code == 200
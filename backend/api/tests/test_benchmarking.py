@@ -0,0 +1,12 @@
+from api.management.benchmarking import percentile
+
+
+def test_percentile_of_unsorted_values():
+    values = [0.3, 0.1, 0.5, 0.2, 0.4]
+    assert percentile(values, 0.5) == 0.3
+    assert percentile(values, 0.95) == 0.5
+    assert values == [0.3, 0.1, 0.5, 0.2, 0.4]
+
+
+def test_percentile_of_no_values():
+    assert percentile([], 0.5) == 0
@@ -0,0 +1,88 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+
+from api.caching import bump_model_version, get_model_version
+from api.models import Ingredient, Recipe, Tag
+from api.response_cache import recipe_list_cache
+
+
+def test_versions_survive_a_cache_flush(db):
+    version = get_model_version(Ingredient)
+    bump_model_version(Ingredient)
+    cache.clear()
+    assert get_model_version(Ingredient) == version + 1
+
+
+def test_bump_without_a_stored_version(db):
+    bump_model_version(Tag)
+    assert get_model_version(Tag) > 0
+
+
+def test_bump_is_rolled_back_with_the_transaction(db):
+    version = get_model_version(Ingredient)
+    with pytest.raises(RuntimeError):
+        with transaction.atomic():
+            bump_model_version(Ingredient)
+            raise RuntimeError
+    assert get_model_version(Ingredient) == version
+
+
+def test_etag_changes_after_a_bump(anonymous_client, ingredients):
+    response = anonymous_client.get('/api/ingredients/')
+    etag = response['ETag']
+    assert anonymous_client.get(
+        '/api/ingredients/',
+        HTTP_IF_NONE_MATCH=etag
+    ).status_code == 304
+
+    # As done by load_ingredients, which runs in another process.
+    bump_model_version(Ingredient)
+    assert anonymous_client.get(
+        '/api/ingredients/',
+        HTTP_IF_NONE_MATCH=etag
+    ).status_code == 200
+
+
+def test_recipe_etag_changes_when_variants_are_stored(
+        anonymous_client, recipe
+):
+    path = f'/api/recipes/{recipe.id}/'
+    etag = anonymous_client.get(path)['ETag']
+    assert anonymous_client.get(
+        path,
+        HTTP_IF_NONE_MATCH=etag
+    ).status_code == 304
+
+    # As done by the generate_image_variants job, pub_date stays the same.
+    Recipe.objects.filter(id=recipe.id).update(
+        image_variants={'thumbnail': '/media/cache/thumbnail.jpg'}
+    )
+    response = anonymous_client.get(path, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response.json()['image_variants']['thumbnail'].endswith(
+        '/media/cache/thumbnail.jpg'
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_login_keeps_the_recipe_list_cache(anonymous_client):
+    User = get_user_model()
+    user = User.objects.create_user(
+        username='reader',
+        email='reader@example.com',
+        password='password'
+    )
+    generation = recipe_list_cache.backend.get_generation()
+
+    response = anonymous_client.post(
+        '/api/auth/token/login/',
+        {'email': 'reader@example.com', 'password': 'password'}
+    )
+    assert response.status_code in (200, 201), response.content
+    assert recipe_list_cache.backend.get_generation() == generation
+
+    user.first_name = 'Читатель'
+    user.save()
+    assert recipe_list_cache.backend.get_generation() == generation + 1
@@ -0,0 +1,52 @@
+import base64
+import io
+import os
+
+import pytest
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+
+from api.fields import BASE64_CHUNK_SIZE, CustomImageField
+
+
+def png_base64(size):
+    buffer = io.BytesIO()
+    Image.frombytes('RGB', (size, size), os.urandom(size * size * 3)).save(
+        buffer,
+        'PNG'
+    )
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def wrap(text, width=76):
+    return '\r\n'.join(
+        text[start:start + width] for start in range(0, len(text), width)
+    )
+
+
+def test_decodes_data_uri_split_into_chunks():
+    encoded = png_base64(200)
+    assert len(encoded) > 2 * BASE64_CHUNK_SIZE
+
+    image = CustomImageField().to_internal_value(
+        'data:image/png;base64,' + encoded
+    )
+
+    assert image.size == len(base64.b64decode(encoded))
+
+
+def test_decodes_data_uri_with_line_breaks():
+    encoded = png_base64(200)
+
+    image = CustomImageField().to_internal_value(
+        'data:image/png;base64,' + wrap(encoded) + '\n'
+    )
+
+    assert image.read() == base64.b64decode(encoded)
+
+
+def test_rejects_invalid_base64():
+    with pytest.raises(ValidationError):
+        CustomImageField().to_internal_value(
+            'data:image/png;base64,' + png_base64(8)[:-4] + '*AAA'
+        )
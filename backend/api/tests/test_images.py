@@ -0,0 +1,79 @@
+from types import SimpleNamespace
+from unittest import mock
+
+from api.images import generate_image_variants
+from api.models import Job, Recipe
+from api.serializers import RecipesReadSerializer
+
+
+def fake_thumbnail(image, geometry, **options):
+    return SimpleNamespace(url=f'/media/cache/{geometry}.jpg')
+
+
+def test_original_image_is_served_until_variants_exist(recipe):
+    with mock.patch('api.images.get_thumbnail') as get_thumbnail:
+        data = RecipesReadSerializer(recipe).data
+    get_thumbnail.assert_not_called()
+    assert set(data['image_variants'].values()) == {recipe.image.url}
+
+
+def test_generated_variants_are_served(recipe):
+    with mock.patch('api.images.get_thumbnail', fake_thumbnail):
+        generate_image_variants(recipe.image.name)
+    recipe.refresh_from_db()
+
+    with mock.patch('api.images.get_thumbnail') as get_thumbnail:
+        data = RecipesReadSerializer(recipe).data
+    get_thumbnail.assert_not_called()
+    assert data['image_variants']['thumbnail'] == '/media/cache/320x320.jpg'
+    assert data['image_variants']['card'] == '/media/cache/640x480.jpg'
+
+
+def test_save_keeps_variants_stored_by_the_job(recipe):
+    stale = Recipe.objects.get(id=recipe.id)
+    with mock.patch('api.images.get_thumbnail', fake_thumbnail):
+        generate_image_variants(recipe.image.name)
+
+    stale.name = 'Блины'
+    stale.save()
+    stale.refresh_from_db()
+    assert stale.image_variants
+
+
+def test_new_image_drops_variants(recipe):
+    with mock.patch('api.images.get_thumbnail', fake_thumbnail):
+        generate_image_variants(recipe.image.name)
+    recipe.refresh_from_db()
+
+    recipe.image = 'recipes/images/waffles.png'
+    recipe.save()
+    recipe.refresh_from_db()
+    assert recipe.image_variants == {}
+
+
+def queued_variants():
+    return list(
+        Job.objects.filter(kind='generate_image_variants').values_list(
+            'payload',
+            flat=True
+        )
+    )
+
+
+def test_variants_are_queued_for_new_recipes(recipe):
+    assert queued_variants() == [{'image': recipe.image.name}]
+
+
+def test_variants_are_not_queued_again_for_the_same_image(recipe):
+    Job.objects.all().delete()
+    recipe.name = 'Блины'
+    recipe.save()
+    Recipe.objects.get(id=recipe.id).save()
+    assert queued_variants() == []
+
+
+def test_variants_are_queued_for_a_new_image(recipe):
+    Job.objects.all().delete()
+    recipe.image = 'recipes/images/waffles.png'
+    recipe.save()
+    assert queued_variants() == [{'image': 'recipes/images/waffles.png'}]
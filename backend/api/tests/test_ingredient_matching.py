@@ -0,0 +1,193 @@
+import random
+from unittest import mock
+
+import pytest
+
+from api.ingredient_matching import (
+    MATCH_ALL, MATCH_ANY, MATCH_MISSING, IngredientMatcher, add_to_counter,
+    bitset_from_ids, change_postings, counter_equals, subtract_from_counter
+)
+from api.models import Ingredient
+
+MODES = [
+    (MATCH_ALL, 0),
+    (MATCH_ANY, 0),
+    (MATCH_MISSING, 0),
+    (MATCH_MISSING, 2),
+]
+
+
+def random_recipes(rng, ingredient_ids, count=80):
+    return {
+        recipe_id: set(rng.sample(ingredient_ids, rng.randint(1, 7)))
+        for recipe_id in rng.sample(range(1, 300), count)
+    }
+
+
+def get_postings(recipes):
+    postings = {}
+    for recipe_id, ingredient_ids in recipes.items():
+        for ingredient_id in ingredient_ids:
+            postings[ingredient_id] = (
+                postings.get(ingredient_id, 0) | 1 << recipe_id
+            )
+    return postings
+
+
+def expected_matches(recipes, ingredient_ids, mode, max_missing):
+    ingredient_ids = set(ingredient_ids)
+    keys = {}
+    for recipe_id, recipe_ingredients in recipes.items():
+        matched = len(recipe_ingredients & ingredient_ids)
+        size = len(recipe_ingredients)
+        if mode == MATCH_ALL:
+            if ingredient_ids and matched == len(ingredient_ids):
+                keys[recipe_id] = (size, -recipe_id)
+        elif mode == MATCH_ANY:
+            if matched:
+                keys[recipe_id] = (-matched, size, -recipe_id)
+        elif matched and size - matched <= max_missing:
+            keys[recipe_id] = (size - matched, -matched, -recipe_id)
+    return sorted(keys, key=keys.get)
+
+
+def queries(rng, ingredient_ids):
+    yield [ingredient_ids[0]]
+    # An ingredient that no recipe uses.
+    yield [ingredient_ids[1], 10 ** 6]
+    for _ in range(20):
+        yield rng.sample(ingredient_ids, rng.randint(1, 4))
+
+
+def assert_matches(matcher, state, recipes, ingredient_ids, rng):
+    for requested in queries(rng, ingredient_ids):
+        for mode, max_missing in MODES:
+            expected = expected_matches(
+                recipes, requested, mode, max_missing
+            )
+            matches = matcher.match(
+                requested, mode, max_missing, state=state
+            )
+            assert len(matches) == len(expected)
+            assert matches[0:len(matches)] == expected
+            start = rng.randint(0, len(expected))
+            stop = start + rng.randint(0, 7)
+            assert matches[start:stop] == expected[start:stop]
+
+
+def counters(planes, recipe_ids):
+    return {
+        recipe_id: sum(
+            (plane >> recipe_id & 1) << index
+            for index, plane in enumerate(planes)
+        )
+        for recipe_id in recipe_ids
+    }
+
+
+def test_bit_sliced_counters_match_plain_counts():
+    rng = random.Random(1)
+    recipe_ids = range(200)
+    counts = dict.fromkeys(recipe_ids, 0)
+    planes = []
+    added = []
+    for _ in range(40):
+        members = rng.sample(recipe_ids, rng.randint(0, 120))
+        planes = add_to_counter(planes, bitset_from_ids(members))
+        added.append(members)
+        for recipe_id in members:
+            counts[recipe_id] += 1
+    for members in rng.sample(added, 25):
+        planes = subtract_from_counter(planes, bitset_from_ids(members))
+        for recipe_id in members:
+            counts[recipe_id] -= 1
+
+    assert counters(planes, recipe_ids) == counts
+    for value in range(-1, max(counts.values()) + 2):
+        assert counter_equals(planes, value) == bitset_from_ids(
+            recipe_id for recipe_id, count in counts.items()
+            if count == value and value > 0
+        )
+
+
+def test_match_agrees_with_set_computation():
+    rng = random.Random(2)
+    ingredient_ids = list(range(1, 13))
+    recipes = random_recipes(rng, ingredient_ids)
+    matcher = IngredientMatcher()
+    state = matcher.load_postings(get_postings(recipes))
+
+    assert_matches(matcher, state, recipes, ingredient_ids, rng)
+
+
+def test_match_respects_the_mask():
+    rng = random.Random(3)
+    ingredient_ids = list(range(1, 13))
+    recipes = random_recipes(rng, ingredient_ids)
+    matcher = IngredientMatcher()
+    state = matcher.load_postings(get_postings(recipes))
+    allowed = set(rng.sample(sorted(recipes), 30))
+
+    for mode, max_missing in MODES:
+        matches = matcher.match(
+            ingredient_ids[:3], mode, max_missing,
+            mask=bitset_from_ids(allowed), state=state
+        )
+        assert matches[0:len(matches)] == [
+            recipe_id for recipe_id in expected_matches(
+                recipes, ingredient_ids[:3], mode, max_missing
+            )
+            if recipe_id in allowed
+        ]
+
+
+def test_applied_changes_agree_with_a_fresh_load():
+    rng = random.Random(4)
+    ingredient_ids = list(range(1, 13))
+    recipes = random_recipes(rng, ingredient_ids)
+    matcher = IngredientMatcher()
+    matcher.load_postings(get_postings(recipes))
+
+    for recipe_id in rng.sample(sorted(recipes), 30):
+        recipes[recipe_id] = set(rng.sample(ingredient_ids, rng.randint(1, 6)))
+    postings = get_postings(recipes)
+    matcher.apply_changes({
+        ingredient_id: postings.get(ingredient_id, 0)
+        for ingredient_id in ingredient_ids
+    })
+
+    assert_matches(matcher, matcher._state, recipes, ingredient_ids, rng)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_refresh_applies_changed_postings(settings):
+    settings.INGREDIENT_MATCH_INDEX_TTL = 3600
+    rng = random.Random(5)
+    ingredient_ids = [
+        Ingredient.objects.create(
+            name=f'ингредиент {number}',
+            measurement_unit='г'
+        ).id
+        for number in range(8)
+    ]
+    recipes = random_recipes(rng, ingredient_ids, count=40)
+    for recipe_id, recipe_ingredients in recipes.items():
+        change_postings(recipe_id, added=recipe_ingredients)
+    matcher = IngredientMatcher()
+    assert_matches(matcher, matcher.refresh(), recipes, ingredient_ids, rng)
+
+    for recipe_id in rng.sample(sorted(recipes), 15):
+        new_ingredients = set(
+            rng.sample(ingredient_ids, rng.randint(1, 6))
+        )
+        change_postings(
+            recipe_id,
+            added=new_ingredients - recipes[recipe_id],
+            removed=recipes[recipe_id] - new_ingredients
+        )
+        recipes[recipe_id] = new_ingredients
+    with mock.patch.object(matcher, 'load_postings') as load_postings:
+        state = matcher.refresh()
+    load_postings.assert_not_called()
+
+    assert_matches(matcher, state, recipes, ingredient_ids, rng)
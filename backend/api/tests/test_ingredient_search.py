@@ -0,0 +1,45 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.models import Ingredient
+
+
+@pytest.fixture
+def catalogue(db, settings):
+    settings.INGREDIENT_SEARCH_INDEX = False
+    settings.INGREDIENT_SEARCH_LIMIT = 3
+    Ingredient.objects.bulk_create([
+        Ingredient(name=name, measurement_unit='г')
+        for name in (
+            'сахарная пудра', 'ванильный сахар', 'сахар', 'соль',
+            'тростниковый сахар', 'сахарный сироп', 'сахар-песок',
+        )
+    ])
+
+
+def search(client, name):
+    response = client.get('/api/ingredients/', {'name': name})
+    return [ingredient['name'] for ingredient in response.json()]
+
+
+def test_contains_matches_follow_prefix_matches(
+        anonymous_client, catalogue, settings
+):
+    settings.INGREDIENT_SEARCH_LIMIT = 10
+    assert search(anonymous_client, 'сахар') == [
+        'сахар', 'сахар-песок', 'сахарная пудра', 'сахарный сироп',
+        'ванильный сахар', 'тростниковый сахар',
+    ]
+
+
+def test_contains_scan_is_skipped_when_prefixes_fill_the_limit(
+        anonymous_client, catalogue
+):
+    with CaptureQueriesContext(connection) as queries:
+        assert search(anonymous_client, 'сахар') == [
+            'сахар', 'сахар-песок', 'сахарная пудра'
+        ]
+    assert not any(
+        "'%сахар%'" in query['sql'] for query in queries.captured_queries
+    )
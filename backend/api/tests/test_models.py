@@ -0,0 +1,42 @@
+from django.db.models import F
+
+from api.models import Recipe
+
+
+def recipe_fields(user):
+    return {
+        'author': user,
+        'name': 'Омлет',
+        'image': 'recipes/images/omelette.png',
+        'text': 'Взбить и пожарить.',
+        'cooking_time': 10,
+    }
+
+
+def test_create_with_explicit_pk(user):
+    recipe = Recipe.objects.create(id=5000, **recipe_fields(user))
+    assert Recipe.objects.filter(id=recipe.id).exists()
+
+
+def test_save_new_instance_with_explicit_pk(user):
+    Recipe(id=5001, **recipe_fields(user)).save()
+    assert Recipe.objects.filter(id=5001).exists()
+
+
+def test_save_keeps_counters(user):
+    recipe = Recipe.objects.create(**recipe_fields(user))
+    Recipe.objects.filter(id=recipe.id).update(
+        favorites_count=F('favorites_count') + 1
+    )
+    recipe.name = 'Омлет с сыром'
+    recipe.save()
+    recipe.refresh_from_db()
+    assert recipe.favorites_count == 1
+    assert recipe.name == 'Омлет с сыром'
+
+
+def test_save_copy_of_a_stored_recipe(user):
+    recipe = Recipe.objects.create(**recipe_fields(user))
+    recipe.pk = None
+    recipe.save()
+    assert Recipe.objects.count() == 2
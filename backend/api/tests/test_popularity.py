@@ -0,0 +1,71 @@
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from api.models import (
+    Favourite, PopularityRefresh, Recipe, RecipePopularity, ShoppingCart
+)
+from api.popularity import (
+    apply_increments, get_event_score, refresh_popularity
+)
+
+
+def get_score(recipe):
+    popularity = RecipePopularity.objects.filter(recipe=recipe).first()
+    return popularity.score if popularity else 0
+
+
+def expected_score(event, weight):
+    epoch = PopularityRefresh.objects.get().epoch
+    return get_event_score(event.created, epoch, weight)
+
+
+def test_increments_are_applied_in_one_update(recipe):
+    other = Recipe.objects.create(
+        author=recipe.author,
+        name='Оладьи',
+        image=recipe.image.name,
+        text='Пожарить.',
+        cooking_time=15
+    )
+    RecipePopularity.objects.create(recipe=recipe, score=1)
+
+    with CaptureQueriesContext(connection) as queries:
+        apply_increments({recipe.id: 2, other.id: 3})
+
+    assert len(queries) == 2
+    assert get_score(recipe) == 3
+    assert get_score(other) == 3
+
+
+def test_removed_favourite_takes_its_score_back(user, recipe, settings):
+    now = timezone.now()
+    favourite = Favourite.objects.create(user=user, recipe=recipe)
+    cart = ShoppingCart.objects.create(user=user, recipe=recipe)
+    refresh_popularity(now + timedelta(minutes=2))
+    favourite.delete()
+
+    favourite = Favourite.objects.create(user=user, recipe=recipe)
+    Favourite.objects.filter(id=favourite.id).update(
+        created=now + timedelta(minutes=2)
+    )
+    favourite.refresh_from_db()
+    refresh_popularity(now + timedelta(minutes=4))
+
+    assert get_score(recipe) == pytest.approx(
+        expected_score(favourite, settings.POPULARITY_FAVOURITE_WEIGHT)
+        + expected_score(cart, settings.POPULARITY_CART_WEIGHT)
+    )
+
+
+def test_uncounted_events_are_not_withdrawn(user, recipe):
+    refresh_popularity()
+    Favourite.objects.create(user=user, recipe=recipe)
+    RecipePopularity.objects.create(recipe=recipe, score=1)
+
+    Favourite.objects.get().delete()
+
+    assert get_score(recipe) == 1
@@ -0,0 +1,168 @@
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from api.ingredient_matching import rebuild_postings
+from api.management.commands.benchmark_api import png_data_uri
+from api.models import (
+    Favourite, Follow, Ingredient, Recipe, RecipeIngredient, ShoppingCart,
+    Tag
+)
+from api.popularity import refresh_popularity
+
+# Queries per request with more rows than fit on a page, so a query per row
+# exceeds the budget. Lower a budget when an endpoint gets cheaper.
+QUERY_BUDGETS = {
+    'recipe_list': ('get', '/api/recipes/?limit=10', 5),
+    'recipe_list_page': ('get', '/api/recipes/?limit=10&page=2', 5),
+    'recipe_list_cursor': (
+        'get', '/api/recipes/?limit=10&pagination=cursor', 5
+    ),
+    'recipe_list_tags': (
+        'get', '/api/recipes/?limit=10&tags=lunch&tags=dinner', 6
+    ),
+    'recipe_list_author': (
+        'get', '/api/recipes/?limit=10&author={author}', 6
+    ),
+    'recipe_list_favorited': (
+        'get', '/api/recipes/?limit=10&is_favorited=1', 5
+    ),
+    'recipe_list_shopping_cart': (
+        'get', '/api/recipes/?limit=10&is_in_shopping_cart=1', 5
+    ),
+    'recipe_list_search': ('get', '/api/recipes/?limit=10&search=суп', 5),
+    'recipe_list_ingredients': (
+        'get', '/api/recipes/?limit=10&ingredients={ingredients}&match=any',
+        5
+    ),
+    'recipe_popular': ('get', '/api/recipes/popular/?limit=10', 5),
+    'recipe_feed': ('get', '/api/recipes/feed/?limit=10', 6),
+    'recipe_detail': ('get', '/api/recipes/{recipe}/', 4),
+    'subscriptions': (
+        'get', '/api/users/subscriptions/?limit=6&recipes_limit=3', 4
+    ),
+    'download_shopping_cart': (
+        'get', '/api/recipes/download_shopping_cart/?file_format=txt', 2
+    ),
+    'ingredient_search': ('get', '/api/ingredients/?name=кар', 2),
+    'recipe_create': ('post', '/api/recipes/', 22),
+    'recipe_update': ('patch', '/api/recipes/{own_recipe}/', 25),
+}
+
+
+@pytest.fixture
+def catalogue(user, settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.DATABASE_REPLICAS = []
+    authors = [user] + [
+        type(user).objects.create_user(
+            username=f'author{number}',
+            email=f'author{number}@example.com',
+            password='password'
+        )
+        for number in range(3)
+    ]
+    for author in authors[1:]:
+        Follow.objects.create(user=user, author=author)
+    tags = [
+        Tag.objects.create(name=name, colour=colour, slug=slug)
+        for name, colour, slug in (
+            ('Обед', '#49B64E', 'lunch'),
+            ('Ужин', '#8775D2', 'dinner'),
+        )
+    ]
+    ingredients = Ingredient.objects.bulk_create([
+        Ingredient(name=f'{name} {number}', measurement_unit='г')
+        for number in range(4)
+        for name in ('картофель', 'морковь', 'капуста')
+    ])
+    ingredients = list(Ingredient.objects.order_by('id'))
+
+    recipes = []
+    for number in range(24):
+        recipe = Recipe.objects.create(
+            author=authors[number % len(authors)],
+            name=f'Суп {number}',
+            image='recipes/images/soup.png',
+            text='Сварить суп.',
+            cooking_time=30
+        )
+        recipe.tags.set(tags[:number % 2 + 1])
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=50)
+            for ingredient in ingredients[number % 4::4]
+        ])
+        recipes.append(recipe)
+    for recipe in recipes[::2]:
+        Favourite.objects.create(user=user, recipe=recipe)
+    for recipe in recipes[::3]:
+        ShoppingCart.objects.create(user=user, recipe=recipe)
+    rebuild_postings()
+    # Past the refresh lag, so the events above are counted.
+    refresh_popularity(timezone.now() + timedelta(minutes=2))
+
+    def recipe_body(iteration):
+        return {
+            'name': 'Щи',
+            'text': 'Сварить щи.',
+            'cooking_time': 40,
+            'image': png_data_uri(),
+            'tags': [tag.id for tag in tags],
+            'ingredients': [
+                {'id': ingredient.id, 'amount': 100}
+                for ingredient in ingredients[iteration:iteration + 8]
+            ],
+        }
+
+    return {
+        'author': authors[1].id,
+        'recipe': recipes[5].id,
+        'own_recipe': recipes[0].id,
+        'ingredients': ','.join(
+            str(ingredient.id) for ingredient in ingredients[:3]
+        ),
+        'body': recipe_body,
+    }
+
+
+def request(client, method, path, body):
+    if method == 'get':
+        response = client.get(path)
+    else:
+        response = getattr(client, method)(path, body, format='json')
+    if response.streaming:
+        assert b''.join(response.streaming_content)
+    assert response.status_code < 400, response.content
+    if response.streaming:
+        return response
+    # A budget is only meaningful for a request that returns something.
+    data = response.json()
+    if isinstance(data, dict) and 'results' in data:
+        data = data['results']
+    assert data, f'{path} returned no results'
+    return response
+
+
+@pytest.mark.parametrize('endpoint', QUERY_BUDGETS)
+def test_query_budget(client, catalogue, endpoint):
+    method, path, budget = QUERY_BUDGETS[endpoint]
+    path = path.format(**catalogue)
+    bodies = [None, None]
+    if method != 'get':
+        # The second body changes some of the ingredients of the first.
+        bodies = [catalogue['body'](iteration) for iteration in (0, 3)]
+    if method == 'patch':
+        for body in bodies:
+            del body['image']
+
+    # The first request fills the per-process caches.
+    request(client, method, path, bodies[0])
+    with CaptureQueriesContext(connection) as queries:
+        request(client, method, path, bodies[1])
+
+    assert len(queries) <= budget, '\n'.join(
+        query['sql'] for query in queries.captured_queries
+    )
@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+
+from api.models import Recipe
+from backend.replicas import ReplicaRouter, ReplicaRoutingMiddleware
+
+REPLICAS = ['replica_0', 'replica_1', 'replica_2', 'replica_3']
+
+
+@override_settings(DATABASE_REPLICAS=REPLICAS)
+def test_request_reads_from_one_replica():
+    router = ReplicaRouter()
+    chosen = []
+
+    def get_response(request):
+        chosen.append({router.db_for_read(Recipe) for _ in range(20)})
+        return HttpResponse()
+
+    middleware = ReplicaRoutingMiddleware(get_response)
+    for _ in range(20):
+        middleware(RequestFactory().get('/api/recipes/'))
+
+    assert all(len(aliases) == 1 for aliases in chosen)
+    assert set.union(*chosen) <= set(REPLICAS)
+
+
+@override_settings(DATABASE_REPLICAS=REPLICAS)
+def test_writes_switch_the_request_to_the_primary():
+    router = ReplicaRouter()
+    aliases = []
+
+    def get_response(request):
+        aliases.append(router.db_for_read(Recipe))
+        router.db_for_write(Recipe)
+        aliases.append(router.db_for_read(Recipe))
+        return HttpResponse()
+
+    response = ReplicaRoutingMiddleware(get_response)(
+        RequestFactory().get('/api/recipes/')
+    )
+    assert aliases[0] in REPLICAS
+    assert aliases[1] == 'default'
+    assert settings.REPLICA_PIN_COOKIE in response.cookies
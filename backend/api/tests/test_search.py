@@ -0,0 +1,42 @@
+from api.models import Recipe
+
+
+def search(client, value):
+    response = client.get('/api/recipes/', {'search': value})
+    assert response.status_code == 200
+    return [recipe['name'] for recipe in response.json()]
+
+
+def create_recipe(author, name, text):
+    return Recipe.objects.create(
+        author=author,
+        name=name,
+        image='recipes/images/soup.png',
+        text=text,
+        cooking_time=30
+    )
+
+
+def test_results_follow_recipe_changes(client, user):
+    recipe = create_recipe(user, 'Суп 1', 'Сварить бульон.')
+    assert search(client, 'суп') == ['Суп 1']
+
+    recipe.name = 'Борщ'
+    recipe.save()
+    assert search(client, 'суп') == []
+    assert search(client, 'борщ') == ['Борщ']
+
+    recipe.delete()
+    assert search(client, 'борщ') == []
+
+
+def test_last_term_matches_a_prefix(client, user):
+    create_recipe(user, 'Грибной суп', 'Сварить.')
+    assert search(client, 'грибной су') == ['Грибной суп']
+    assert search(client, 'грибы') == []
+
+
+def test_name_matches_rank_above_text_matches(client, user):
+    create_recipe(user, 'Рагу', 'Добавить тыкву и тушить.')
+    create_recipe(user, 'Тыква запечённая', 'Запечь.')
+    assert search(client, 'тыкв') == ['Тыква запечённая', 'Рагу']
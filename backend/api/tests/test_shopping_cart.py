@@ -0,0 +1,148 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from api.models import Ingredient, Recipe, RecipeIngredient, ShoppingCart
+from api.shopping_cart import update_shopping_lists
+
+User = get_user_model()
+
+
+def shopping_list(user):
+    return dict(
+        user.shopping_list_items.values_list(
+            'ingredient__name',
+            'total_amount'
+        )
+    )
+
+
+def test_cart_action_maintains_the_list(client, user, recipe):
+    assert client.get(
+        f'/api/recipes/{recipe.id}/shopping_cart/'
+    ).status_code == 201
+    assert shopping_list(user) == {
+        'мука': 100,
+        'сахар': 100,
+        'молоко': 100
+    }
+
+    assert client.delete(
+        f'/api/recipes/{recipe.id}/shopping_cart/'
+    ).status_code == 204
+    assert shopping_list(user) == {}
+
+
+def test_deleting_a_cart_entry_outside_the_api(user, recipe):
+    entry = ShoppingCart.objects.create(user=user, recipe=recipe)
+    entry.delete()
+    assert shopping_list(user) == {}
+
+
+def test_deleting_a_recipe_updates_the_lists(user, recipe, ingredients):
+    other = RecipeIngredient.objects.get(
+        recipe=recipe,
+        ingredient=ingredients[0]
+    )
+    ShoppingCart.objects.create(user=user, recipe=recipe)
+    recipe.pk = None
+    recipe.save()
+    RecipeIngredient.objects.create(
+        recipe=recipe,
+        ingredient=ingredients[0],
+        amount=50
+    )
+    ShoppingCart.objects.create(user=user, recipe=recipe)
+    assert shopping_list(user)['мука'] == 150
+
+    other.recipe.delete()
+    assert shopping_list(user) == {'мука': 50}
+
+
+def test_editing_recipe_ingredients_outside_the_api(user, recipe, ingredients):
+    ShoppingCart.objects.create(user=user, recipe=recipe)
+    item = RecipeIngredient.objects.get(
+        recipe=recipe,
+        ingredient=ingredients[1]
+    )
+    item.amount = 30
+    item.save()
+    RecipeIngredient.objects.filter(ingredient=ingredients[2]).delete()
+    assert shopping_list(user) == {'мука': 100, 'сахар': 30}
+
+    Ingredient.objects.filter(id=ingredients[0].id).delete()
+    assert shopping_list(user) == {'сахар': 30}
+
+
+def test_recipe_update_through_the_api(client, user, recipe, ingredients):
+    ShoppingCart.objects.create(user=user, recipe=recipe)
+    response = client.patch(
+        f'/api/recipes/{recipe.id}/',
+        {
+            'ingredients': [
+                {'id': ingredients[0].id, 'amount': 250},
+                {'id': ingredients[1].id, 'amount': 100},
+            ],
+        },
+        format='json'
+    )
+    assert response.status_code == 200
+    assert shopping_list(user) == {'мука': 250, 'сахар': 100}
+
+
+def test_additions_to_an_existing_item_add_up(user, ingredients):
+    update_shopping_lists([user.id], {ingredients[0].id: 100})
+    # A concurrent request already created the row.
+    update_shopping_lists([user.id], {ingredients[0].id: 40})
+    assert shopping_list(user) == {'мука': 140}
+
+
+def swap_ingredients_queries(client, user, recipe, count):
+    buyers = [user] + [
+        User.objects.create_user(
+            username=f'buyer{recipe.id}-{number}',
+            password='password'
+        )
+        for number in range(2)
+    ]
+    Ingredient.objects.bulk_create([
+        Ingredient(name=f'специя {recipe.id}-{number}', measurement_unit='г')
+        for number in range(2 * count)
+    ])
+    catalogue = list(
+        Ingredient.objects.filter(name__startswith=f'специя {recipe.id}-')
+    )
+    RecipeIngredient.objects.filter(recipe=recipe).delete()
+    RecipeIngredient.objects.bulk_create([
+        RecipeIngredient(recipe=recipe, ingredient=ingredient, amount=5)
+        for ingredient in catalogue[:count]
+    ])
+    for buyer in buyers:
+        ShoppingCart.objects.create(user=buyer, recipe=recipe)
+
+    with CaptureQueriesContext(connection) as queries:
+        response = client.patch(
+            f'/api/recipes/{recipe.id}/',
+            {
+                'ingredients': [
+                    {'id': ingredient.id, 'amount': 7}
+                    for ingredient in catalogue[count:]
+                ],
+            },
+            format='json'
+        )
+    assert response.status_code == 200
+    assert list(shopping_list(buyers[1]).values()) == [7] * count
+    return len(queries)
+
+
+def test_recipe_update_cost_does_not_grow_with_ingredients(
+        client, user, recipe
+):
+    copy = Recipe.objects.get(id=recipe.id)
+    copy.pk = None
+    copy.save()
+
+    assert swap_ingredients_queries(client, user, recipe, 5) == (
+        swap_ingredients_queries(client, user, copy, 30)
+    )
@@ -0,0 +1,27 @@
+import pytest
+from django.contrib.auth import get_user_model
+
+User = get_user_model()
+
+
+@pytest.fixture
+def author(db):
+    return User.objects.create_user(
+        username='baker',
+        email='baker@example.com',
+        password='password'
+    )
+
+
+def test_subscribe_answers_with_the_new_subscription(client, author):
+    response = client.get(f'/api/users/{author.id}/subscribe/')
+
+    assert response.status_code == 201
+    assert response.json()['is_subscribed'] is True
+
+
+def test_subscribe_twice_is_rejected(client, author):
+    client.get(f'/api/users/{author.id}/subscribe/')
+    response = client.get(f'/api/users/{author.id}/subscribe/')
+
+    assert response.status_code == 400
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
@@ -32,3 +33,8 @@ urlpatterns = [
     path('', include(v1_router.urls)),
     path('auth/', include('djoser.urls.authtoken')),
 ]
+
+if settings.API_ASYNC_VIEWS:
+    from .async_views import async_urlpatterns
+
+    urlpatterns.insert(0, path('', include(async_urlpatterns)))
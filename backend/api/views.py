@@ -1,11 +1,21 @@
+import hashlib
+import json
+
 from rest_framework import viewsets
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.http import HttpResponse
+from django.db.models import (
+    BooleanField, Exists, F, OuterRef, Prefetch, Value,
+    prefetch_related_objects
+)
+from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
 
 from django_filters.rest_framework import DjangoFilterBackend
 
@@ -15,7 +25,16 @@ from .serializers import (
     RecipesListSerializer, UserCreateSerializer
 )
 from .models import Tag, Ingredient, Favourite, Recipe, Follow, ShoppingCart
-from .paginators import VariablePageSizePaginator
+from .autocomplete import ingredient_index
+from .caching import conditional_get, model_version_etag
+from .ingredient_matching import (
+    bitset_from_ids, ingredient_matcher, parse_ingredient_ids, parse_match
+)
+from .paginators import (
+    FeedPaginator, IngredientMatchPaginator, OptionalKeysetPaginator
+)
+from .response_cache import recipe_list_cache
+from .shopping_cart import FILE_FORMATS, get_shopping_list
 from .filters import RecipesFilter, IngredientFilter
 from .permissions import (
     IsOwnerOrAuthenticatedOrReadOnly,
@@ -25,6 +44,30 @@ from .permissions import (
 User = get_user_model()
 
 
+def get_recipe_etag(request, id):
+    if request.user.is_authenticated:
+        return None
+    recipe = Recipe.objects.filter(id=id).values_list(
+        'pub_date',
+        'image_variants'
+    ).first()
+    if recipe is None:
+        return None
+    # The image job stores the variants without touching pub_date, so they
+    # are part of the validator.
+    pub_date, image_variants = recipe
+    variants = hashlib.md5(
+        json.dumps(image_variants, sort_keys=True).encode()
+    ).hexdigest()
+    return f'recipe-{pub_date.timestamp()}-{variants}'
+
+
+def get_recipe_cache_control(request):
+    if request.user.is_authenticated:
+        return {'private': True, 'no_cache': True}
+    return {'public': True, 'no_cache': True}
+
+
 class TagsViewSet(viewsets.ModelViewSet):
     serializer_class = TagsSerializer
     queryset = Tag.objects.all()
@@ -32,6 +75,14 @@ class TagsViewSet(viewsets.ModelViewSet):
     lookup_field = 'id'
     http_method_names = ['get', ]
 
+    @conditional_get(etag_func=model_version_etag(Tag))
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_get(etag_func=model_version_etag(Tag))
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
 
 class IngredientsViewSet(viewsets.ModelViewSet):
     serializer_class = IngredientsSerializer
@@ -42,20 +93,119 @@ class IngredientsViewSet(viewsets.ModelViewSet):
     filter_backends = [DjangoFilterBackend, ]
     filterset_class = IngredientFilter
 
+    @conditional_get(etag_func=model_version_etag(Ingredient))
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    @conditional_get(etag_func=model_version_etag(Ingredient))
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if name is None or not settings.INGREDIENT_SEARCH_INDEX:
+            return super().list(request, *args, **kwargs)
+        return Response(
+            ingredient_index.search(name, settings.INGREDIENT_SEARCH_LIMIT)
+        )
+
 
 class RecipesViewSet(viewsets.ModelViewSet):
-    queryset = Recipe.objects.all()
     lookup_field = 'id'
-    pagination_class = VariablePageSizePaginator
+    pagination_class = OptionalKeysetPaginator
+    keyset_ordering = ('-pub_date', '-id')
     http_method_names = ['get', 'post', 'put', 'patch', 'delete']
     filterset_class = RecipesFilter
     permission_classes = [IsOwnerOrAuthenticatedOrReadOnly, ]
 
+    def get_queryset(self):
+        if self.action in ['list', 'retrieve']:
+            return Recipe.objects.with_related().with_user_flags(
+                self.request.user
+            )
+        return Recipe.objects.all()
+
     def get_serializer_class(self):
         if self.request.method in ['GET']:
             return RecipesListSerializer
         return RecipesCreateSerializer
 
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if (
+                self.action == 'list'
+                and 'search_rank' in queryset.query.annotations
+        ):
+            self.keyset_ordering = ('-search_rank', '-id')
+            queryset = queryset.order_by(*self.keyset_ordering)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return self.list_recipes(request, *args, **kwargs)
+        key = recipe_list_cache.make_key(request)
+        data = recipe_list_cache.get(key)
+        if data is not None:
+            return Response(data)
+        response = self.list_recipes(request, *args, **kwargs)
+        recipe_list_cache.set(key, response.data)
+        return response
+
+    def list_recipes(self, request, *args, **kwargs):
+        if 'ingredients' in request.query_params:
+            return self.match_ingredients(request)
+        return super().list(request, *args, **kwargs)
+
+    def match_ingredients(self, request):
+        try:
+            ingredient_ids = parse_ingredient_ids(
+                request.query_params['ingredients']
+            )
+            mode, max_missing = parse_match(
+                request.query_params.get('match')
+            )
+        except ValueError as error:
+            raise ValidationError({'ingredients': [str(error)]})
+
+        # Other filters are applied in the database and narrow the matches
+        # down through a bitset of the recipes they let through.
+        mask = None
+        if set(request.query_params) & set(self.filterset_class.base_filters):
+            mask = bitset_from_ids(
+                self.filter_queryset(Recipe.objects.all()).values_list(
+                    'id',
+                    flat=True
+                )
+            )
+        matches = ingredient_matcher.match(
+            ingredient_ids,
+            mode,
+            max_missing,
+            mask
+        )
+
+        paginator = IngredientMatchPaginator()
+        recipe_ids = paginator.paginate_queryset(matches, request, self)
+        recipes = Recipe.objects.with_related().with_user_flags(
+            request.user
+        ).in_bulk(recipe_ids)
+        serializer = RecipesListSerializer(
+            [recipes[recipe_id] for recipe_id in recipe_ids
+             if recipe_id in recipes],
+            many=True,
+            context={'request': request}
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    @conditional_get(
+        etag_func=get_recipe_etag,
+        cache_control=get_recipe_cache_control
+    )
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    def get_list_instance(self, instance):
+        return Recipe.objects.with_related().with_user_flags(
+            self.request.user
+        ).get(id=instance.id)
+
     def perform_create(self, serializer):
         return serializer.save()
 
@@ -67,7 +217,7 @@ class RecipesViewSet(viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
         instance = self.perform_create(serializer)
         serializer = RecipesListSerializer(
-            instance,
+            self.get_list_instance(instance),
             context={'request': self.request}
         )
         headers = self.get_success_headers(serializer.data)
@@ -88,13 +238,60 @@ class RecipesViewSet(viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
         instance = self.perform_update(serializer)
         serializer = RecipesListSerializer(
-            instance,
+            self.get_list_instance(instance),
             context={'request': self.request}
         )
+        return Response(serializer.data)
 
-        if getattr(instance, '_prefetched_objects_cache', None):
-            instance._prefetched_objects_cache = {}
+    @action(
+        methods=['get'],
+        detail=False,
+        permission_classes=[IsAuthenticated, ],
+        url_path='feed'
+    )
+    def feed(self, request):
+        paginator = FeedPaginator()
+        recipe_ids = paginator.paginate_feed(request.user, request)
+        recipes = Recipe.objects.with_related().with_user_flags(
+            request.user
+        ).in_bulk(recipe_ids)
+        serializer = RecipesListSerializer(
+            [recipes[recipe_id] for recipe_id in recipe_ids
+             if recipe_id in recipes],
+            many=True,
+            context={'request': request}
+        )
+        return paginator.get_paginated_response(serializer.data)
 
+    @action(
+        methods=['get'],
+        detail=False,
+        url_path='popular'
+    )
+    def popular(self, request):
+        queryset = self.filter_queryset(
+            Recipe.objects.with_related().with_user_flags(
+                request.user
+            ).filter(
+                popularity__isnull=False
+            ).annotate(
+                popularity_score=F('popularity__score')
+            ).order_by('-popularity_score', '-id')
+        )
+        self.keyset_ordering = ('-popularity_score', '-id')
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = RecipesListSerializer(
+                page,
+                many=True,
+                context={'request': request}
+            )
+            return self.get_paginated_response(serializer.data)
+        serializer = RecipesListSerializer(
+            queryset,
+            many=True,
+            context={'request': request}
+        )
         return Response(serializer.data)
 
     @action(
@@ -104,29 +301,21 @@ class RecipesViewSet(viewsets.ModelViewSet):
         url_path='download_shopping_cart'
     )
     def download_shopping_cart(self, request):
-        recipes_ids = request.user.shop_list.values_list('recipe', flat=True)
-        ingredients = list(
-            Recipe.objects.filter(id__in=recipes_ids).values_list(
-                'recipe_ingredients__ingredient__name',
-                'recipe_ingredients__ingredient__measurement_unit',
-                'recipe_ingredients__amount'
-            )
+        file_format = request.query_params.get('file_format', 'txt')
+        if file_format not in FILE_FORMATS:
+            data = {
+                'errors': f'Unsupported file format: {file_format}!'
+            }
+            return Response(data=data, status=status.HTTP_400_BAD_REQUEST)
+        lines, content_type, extension = FILE_FORMATS[file_format]
+        items = get_shopping_list(request.user).iterator()
+        response = StreamingHttpResponse(
+            lines(items),
+            content_type=f'{content_type}; charset=utf-8'
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="Ingredients list.{extension}"'
         )
-        data = {}
-        for ingredient in ingredients:
-            if ingredient[0] in data:
-                data[ingredient[0]][0] += ingredient[2]
-            else:
-                data[ingredient[0]] = [
-                    ingredient[2],
-                    ingredient[1]
-                ]
-
-        result = ''
-        for key in data:
-            result += f'· {key} ({data[key][1]}) - {data[key][0]}\n'.capitalize()
-        response = HttpResponse(result, content_type='text/plain')
-        response['Content-Disposition'] = f'attachment; filename="Ingredients list"'
         return response
 
     @action(
@@ -136,33 +325,28 @@ class RecipesViewSet(viewsets.ModelViewSet):
     def favourite(self, request, id):
         recipe = self.get_object()
         if request.method == 'GET':
-            if Favourite.objects.filter(
-                    user=request.user,
-                    recipe=recipe
-            ).exists():
+            favourite, created = Favourite.objects.get_or_create(
+                user=request.user,
+                recipe=recipe
+            )
+            if not created:
                 data = {
                     'errors': 'Рецепт уже в избранном!'
                 }
                 return Response(data=data, status=status.HTTP_400_BAD_REQUEST)
-            else:
-                Favourite.objects.create(user=request.user, recipe=recipe)
-                serializer = RecipesReadSerializer(recipe)
-                return Response(
-                    data=serializer.data,
-                    status=status.HTTP_201_CREATED
-                )
+            serializer = RecipesReadSerializer(recipe)
+            return Response(
+                data=serializer.data,
+                status=status.HTTP_201_CREATED
+            )
         elif request.method == 'DELETE':
-            if Favourite.objects.filter(
-                    user=request.user,
-                    recipe=recipe
-            ).exists():
-                Favourite.objects.get(
-                    user=request.user,
-                    recipe=recipe
-                ).delete()
-                return Response(status=status.HTTP_204_NO_CONTENT)
-            else:
+            deleted, _ = Favourite.objects.filter(
+                user=request.user,
+                recipe=recipe
+            ).delete()
+            if not deleted:
                 return Response(status=status.HTTP_400_BAD_REQUEST)
+            return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(
         methods=['get', 'delete'], detail=True,
@@ -171,10 +355,11 @@ class RecipesViewSet(viewsets.ModelViewSet):
     def shopping_cart(self, request, id):
         recipe = self.get_object()
         if request.method == 'GET':
-            if ShoppingCart.objects.filter(
-                    user=request.user,
-                    recipe=recipe
-            ).exists():
+            cart_item, created = ShoppingCart.objects.get_or_create(
+                user=request.user,
+                recipe=recipe
+            )
+            if not created:
                 data = {
                     'errors': 'Уже в списке покупок!'
                 }
@@ -182,34 +367,40 @@ class RecipesViewSet(viewsets.ModelViewSet):
                     data=data,
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            else:
-                ShoppingCart.objects.create(user=request.user, recipe=recipe)
-                serializer = RecipesReadSerializer(recipe)
-                return Response(
-                    data=serializer.data,
-                    status=status.HTTP_201_CREATED
-                )
+            serializer = RecipesReadSerializer(recipe)
+            return Response(
+                data=serializer.data,
+                status=status.HTTP_201_CREATED
+            )
         elif request.method == 'DELETE':
-            if ShoppingCart.objects.filter(
-                    user=request.user,
-                    recipe=recipe
-            ).exists():
-                ShoppingCart.objects.get(
-                    user=request.user,
-                    recipe=recipe
-                ).delete()
-                return Response(status=status.HTTP_204_NO_CONTENT)
-            else:
+            deleted, _ = ShoppingCart.objects.filter(
+                user=request.user,
+                recipe=recipe
+            ).delete()
+            if not deleted:
                 return Response(status=status.HTTP_400_BAD_REQUEST)
+            return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class UserViewSet(viewsets.ModelViewSet):
-    queryset = User.objects.all()
-    pagination_class = VariablePageSizePaginator
+    pagination_class = OptionalKeysetPaginator
+    keyset_ordering = ('id',)
     permission_classes = [RegistrationOrGetUsersPermission, ]
     lookup_field = 'id'
     http_method_names = ['get', 'post', 'delete']
 
+    def get_queryset(self):
+        if self.request.user.is_authenticated:
+            return User.objects.annotate(
+                is_subscribed=Exists(
+                    Follow.objects.filter(
+                        user=self.request.user,
+                        author=OuterRef('pk')
+                    )
+                )
+            )
+        return User.objects.all()
+
     def get_serializer_class(self):
         if self.request.method == 'GET':
             return UserReadSerializer
@@ -250,25 +441,43 @@ class UserViewSet(viewsets.ModelViewSet):
     )
     def subscriptions(self, request):
         queryset = User.objects.filter(
-            id__in=list(
-                request.user.follower.all().values_list('author', flat=True)
-            )
-        )
+            following__user=request.user
+        ).annotate(
+            recipes_count=Coalesce('stats__recipes_count', 0),
+            is_subscribed=Value(True, output_field=BooleanField())
+        ).order_by('id')
         page = self.paginate_queryset(queryset)
-        if page is not None:
-            serializer = UserSubscriptionSerializer(
-                page,
-                many=True,
-                context={'request': request}
-            )
-            return self.get_paginated_response(serializer.data)
+        authors = page if page is not None else list(queryset)
+        self.prefetch_subscription_recipes(authors)
         serializer = UserSubscriptionSerializer(
-            queryset,
+            authors,
             many=True,
             context={'request': request}
         )
+        if page is not None:
+            return self.get_paginated_response(serializer.data)
         return Response(serializer.data)
 
+    def prefetch_subscription_recipes(self, authors):
+        recipes = Recipe.objects.filter(author__in=authors)
+        recipes_limit = self.request.query_params.get('recipes_limit')
+        if recipes_limit is not None:
+            try:
+                recipes_limit = int(recipes_limit)
+            except ValueError:
+                raise ValidationError(
+                    {'recipes_limit': ['A valid integer is required.']}
+                )
+            recipes = recipes.latest_per_author(max(recipes_limit, 0))
+        prefetch_related_objects(
+            authors,
+            Prefetch(
+                'recipes',
+                queryset=recipes.order_by('-pub_date', '-id'),
+                to_attr='subscription_recipes'
+            )
+        )
+
     @action(
         methods=['get', 'delete'], detail=True,
         permission_classes=[IsAuthenticated, ], url_path='subscribe'
@@ -289,6 +498,8 @@ class UserViewSet(viewsets.ModelViewSet):
                 )
             else:
                 Follow.objects.create(user=request.user, author=author)
+                # The annotation was read before the subscription existed.
+                author.is_subscribed = True
                 serializer = UserSubscriptionSerializer(
                     author,
                     context={'request': self.request}
@@ -0,0 +1,28 @@
+from django.db.backends.postgresql import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    # Persistent connections may have been closed by the server or by
+    # pgbouncer while idle. With CONN_HEALTH_CHECKS they are checked once per
+    # request, before their first use, and replaced if they are broken.
+    health_check_done = False
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        self.health_check_done = False
+
+    def ensure_connection(self):
+        if (
+                self.connection is not None
+                and not self.health_check_done
+                and not self.in_atomic_block
+                and self.settings_dict.get('CONN_HEALTH_CHECKS')
+        ):
+            if not self.is_usable():
+                self.close()
+            self.health_check_done = True
+        super().ensure_connection()
+
+    def connect(self):
+        super().connect()
+        self.health_check_done = True
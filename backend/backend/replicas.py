@@ -0,0 +1,105 @@
+import hashlib
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Routing state of the current request, None outside of requests so that
+# management commands and workers always use the primary.
+request_routing = ContextVar('request_routing', default=None)
+
+
+class RequestRouting:
+    def __init__(self, use_replica, replica=None):
+        self.use_replica = use_replica
+        # Replicas lag by different amounts, so every read of a request goes
+        # to the same one: counts, pages and prefetches must agree.
+        self.replica = replica
+        self.wrote = False
+
+
+def get_pin_key(identity):
+    digest = hashlib.sha256(identity.encode()).hexdigest()
+    return f'replica-pin:{digest}'
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        routing = request_routing.get()
+        if (
+                routing is None
+                or not routing.use_replica
+                or routing.replica is None
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return routing.replica
+
+    def db_for_write(self, model, **hints):
+        routing = request_routing.get()
+        if routing is not None:
+            # Some GET actions write as well, their remaining reads must see
+            # the new rows.
+            routing.use_replica = False
+            routing.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def get_identity(self, request):
+        return request.META.get('HTTP_AUTHORIZATION') or request.COOKIES.get(
+            settings.SESSION_COOKIE_NAME
+        )
+
+    def is_pinned(self, request, identity):
+        if settings.REPLICA_PIN_COOKIE in request.COOKIES:
+            return True
+        return identity is not None and cache.get(get_pin_key(identity))
+
+    def __call__(self, request):
+        if not settings.DATABASE_REPLICAS:
+            return self.get_response(request)
+
+        identity = self.get_identity(request)
+        routing = RequestRouting(
+            request.method in SAFE_METHODS
+            and not self.is_pinned(request, identity),
+            random.choice(settings.DATABASE_REPLICAS)
+        )
+        token = request_routing.set(routing)
+        try:
+            response = self.get_response(request)
+        finally:
+            request_routing.reset(token)
+
+        if routing.wrote or request.method not in SAFE_METHODS:
+            # Read your own writes: the client stays on the primary until
+            # the replicas have caught up. The cookie covers requests that
+            # change the credentials, such as logging in.
+            if identity is not None:
+                cache.set(
+                    get_pin_key(identity),
+                    True,
+                    settings.REPLICA_PIN_SECONDS
+                )
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE,
+                '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax'
+            )
+        return response
@@ -24,11 +24,13 @@ INSTALLED_APPS = [
     'django_filters',
     'djoser',
     'corsheaders',
-    'api',
+    'sorl.thumbnail',
+    'api.apps.ApiConfig',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'backend.replicas.ReplicaRoutingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -69,21 +71,170 @@ REST_FRAMEWORK = {
     ),
 }
 
+# Read replica pins live in this cache, so it has to be shared (e.g.
+# memcached) when running more than one worker process.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            default='django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', default=''),
+    }
+}
+
+API_CACHE_CONTROL = {
+    'public': True,
+    'max_age': int(os.environ.get('API_CACHE_MAX_AGE', default=60)),
+}
+
+# Rendered anonymous recipe list pages. The local backend is per process,
+# use api.response_cache.RedisBackend to share entries between workers.
+RECIPE_LIST_CACHE = {
+    'BACKEND': os.environ.get(
+        'RECIPE_LIST_CACHE_BACKEND',
+        default='api.response_cache.LocalMemoryBackend'
+    ),
+    'OPTIONS': {
+        'timeout': int(
+            os.environ.get('RECIPE_LIST_CACHE_TIMEOUT', default=60)
+        ),
+    },
+}
+if 'REDIS_URL' in os.environ:
+    RECIPE_LIST_CACHE['OPTIONS']['url'] = os.environ['REDIS_URL']
+
+# Upper bound for the total count reported by cursor pagination, 0 disables
+# counting altogether.
+KEYSET_PAGINATION_COUNT_CAP = int(
+    os.environ.get('KEYSET_PAGINATION_COUNT_CAP', default=1000)
+)
+
+# Popular recipes ranking, refreshed by the refresh_popularity command.
+POPULARITY_HALF_LIFE_HOURS = float(
+    os.environ.get('POPULARITY_HALF_LIFE_HOURS', default=72)
+)
+POPULARITY_FAVOURITE_WEIGHT = 1.0
+POPULARITY_CART_WEIGHT = 0.5
+POPULARITY_REFRESH_LAG = int(
+    os.environ.get('POPULARITY_REFRESH_LAG', default=60)
+)
+
+# Authors with at least this many followers are merged into subscription
+# feeds on read instead of being fanned out to every follower on write.
+FEED_FANOUT_MAX_FOLLOWERS = int(
+    os.environ.get('FEED_FANOUT_MAX_FOLLOWERS', default=1000)
+)
+FEED_BACKFILL_LIMIT = 100
+
+# Background jobs, processed by the run_jobs command.
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_DELAY = 30
+JOB_LOCK_TIMEOUT = 600
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', default=2))
+MEDIA_SWEEP_INTERVAL = int(
+    os.environ.get('MEDIA_SWEEP_INTERVAL', default=24 * 3600)
+)
+# Uploads are written before their transaction commits, files younger than
+# this are never treated as orphans.
+MEDIA_SWEEP_GRACE_PERIOD = 3600
+
+# Served through backend.asgi the hot read endpoints run as async views
+# that hand the request over to a dedicated thread pool.
+API_ASYNC_VIEWS = os.environ.get('API_ASYNC_VIEWS', default='False') == 'True'
+ASYNC_VIEW_THREADS = int(os.environ.get('ASYNC_VIEW_THREADS', default=16))
+
+INGREDIENT_SEARCH_INDEX = os.environ.get(
+    'INGREDIENT_SEARCH_INDEX', default='True'
+) == 'True'
+INGREDIENT_SEARCH_INDEX_TTL = int(
+    os.environ.get('INGREDIENT_SEARCH_INDEX_TTL', default=300)
+)
+INGREDIENT_SEARCH_LIMIT = int(
+    os.environ.get('INGREDIENT_SEARCH_LIMIT', default=50)
+)
+# The matching index is reloaded in full after this many seconds, between
+# reloads only the changed postings are read.
+INGREDIENT_MATCH_INDEX_TTL = int(
+    os.environ.get('INGREDIENT_MATCH_INDEX_TTL', default=3600)
+)
+INGREDIENT_MATCH_MAX_INGREDIENTS = int(
+    os.environ.get('INGREDIENT_MATCH_MAX_INGREDIENTS', default=50)
+)
+INGREDIENT_MATCH_MAX_MISSING = int(
+    os.environ.get('INGREDIENT_MATCH_MAX_MISSING', default=5)
+)
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
     'SEND_ACTIVATION_EMAIL': False,
 }
 
-# DATABASES = {
-#     'default': {
-#         'ENGINE': 'django.db.backends.postgresql',
-#         'NAME': os.environ.get('DB_NAME', default='postgres'),
-#         'USER': os.environ.get('POSTGRES_USER', default='postgres'),
-#         'PASSWORD': os.environ.get('POSTGRES_PASSWORD', default='qwerty1234'),
-#         'HOST': os.environ.get('DB_HOST', default='db'),
-#         'PORT': os.environ.get('DB_PORT', default=5432),
-#     }
-# }
+# DB_ENGINE=postgresql switches from the local SQLite file to PostgreSQL.
+if os.environ.get('DB_ENGINE', default='sqlite') == 'postgresql':
+    DATABASES = {
+        'default': {
+            # django.db.backends.postgresql with connection health checks.
+            'ENGINE': 'backend.postgresql',
+            'NAME': os.environ.get('DB_NAME', default='postgres'),
+            'USER': os.environ.get('POSTGRES_USER', default='postgres'),
+            'PASSWORD': os.environ.get(
+                'POSTGRES_PASSWORD',
+                default='qwerty1234'
+            ),
+            'HOST': os.environ.get('DB_HOST', default='db'),
+            'PORT': os.environ.get('DB_PORT', default=5432),
+            # Connections are kept open between requests for this many
+            # seconds, 0 closes them after every request.
+            'CONN_MAX_AGE': int(
+                os.environ.get('DB_CONN_MAX_AGE', default=60)
+            ),
+            'CONN_HEALTH_CHECKS': os.environ.get(
+                'DB_CONN_HEALTH_CHECKS', default='True'
+            ) == 'True',
+            # pgbouncer in transaction pooling mode cannot keep the named
+            # cursors used by QuerySet.iterator() across transactions.
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get(
+                'DB_PGBOUNCER', default='False'
+            ) == 'True',
+            'OPTIONS': {
+                'connect_timeout': int(
+                    os.environ.get('DB_CONNECT_TIMEOUT', default=5)
+                ),
+            },
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        }
+    }
+
+# Comma separated replicas of the default database, host[:port] for
+# PostgreSQL or file names for SQLite. Reads of safe requests go to them.
+DATABASE_REPLICAS = []
+for number, replica in enumerate(
+        filter(None, os.environ.get('DB_REPLICAS', default='').split(',')),
+        start=1
+):
+    alias = f'replica_{number}'
+    DATABASES[alias] = dict(DATABASES['default'], TEST={'MIRROR': 'default'})
+    if DATABASES[alias]['ENGINE'] == 'django.db.backends.sqlite3':
+        DATABASES[alias]['NAME'] = os.path.join(BASE_DIR, replica.strip())
+    else:
+        host, _, port = replica.strip().partition(':')
+        DATABASES[alias]['HOST'] = host
+        DATABASES[alias]['PORT'] = port or DATABASES['default']['PORT']
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['backend.replicas.ReplicaRouter']
+# A client that has written reads from the primary for this many seconds.
+REPLICA_PIN_SECONDS = int(
+    os.environ.get('DB_REPLICA_PIN_SECONDS', default=10)
+)
+REPLICA_PIN_COOKIE = 'primary_db_pin'
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -113,12 +264,33 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
+MAX_IMAGE_UPLOAD_SIZE = int(
+    os.environ.get('MAX_IMAGE_UPLOAD_SIZE', default=10 * 1024 * 1024)
+)
+
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+THUMBNAIL_PREFIX = 'cache/'
+THUMBNAIL_UPSCALE = False
+IMAGE_VARIANT_FORMAT = os.environ.get('IMAGE_VARIANT_FORMAT', default='WEBP')
+IMAGE_VARIANTS = {
+    'thumbnail': {
+        'geometry': '320x320',
+        'crop': 'center',
+        'format': IMAGE_VARIANT_FORMAT,
+        'quality': 75,
+    },
+    'card': {
+        'geometry': '640x480',
+        'crop': 'center',
+        'format': IMAGE_VARIANT_FORMAT,
+        'quality': 80,
+    },
+    'full': {
+        'geometry': '1600x1600',
+        'format': IMAGE_VARIANT_FORMAT,
+        'quality': 85,
+    },
 }
+
@@ -0,0 +1,11 @@
+import os
+
+bind = '0.0.0.0:8000'
+workers = int(os.environ.get('GUNICORN_WORKERS', default=1))
+
+# SERVER_MODE=asgi serves backend.asgi with uvicorn workers.
+if os.environ.get('SERVER_MODE', default='wsgi') == 'asgi':
+    wsgi_app = 'backend.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'backend.wsgi:application'